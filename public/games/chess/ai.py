@@ -0,0 +1,923 @@
+
+import copy
+import math
+import os
+import random
+import time
+from array import array
+
+from engine import (CAPTURED_SHIFT, FILE_A, MOVE_KEY_MASK, MOVED_SHIFT, PIECE_MASK, PIECE_TYPES, PROMOTION_SHIFT,
+                    TACTICAL_MASK, TOTAL_PHASE, EVALUATION_WEIGHTS, EndgameTables, OpeningBook, squares_of)
+
+
+# ==========================================
+# CHESS AI (Negamax w/ Alpha-Beta)
+# ==========================================
+
+piece_score = {"K": 0, "Q": 900, "R": 500, "B": 330, "N": 320, "P": 100}  # Centipawns, for exchange evaluation
+CHECKMATE = 100000  # Less the plies from the root to the mate, so nearer mates score higher
+MATE_BOUND = CHECKMATE - 1000  # Any score beyond this is a mate; no search reaches 1000 plies
+STALEMATE = 0
+MAX_DEPTH = 32  # Iterative deepening stops here even if time remains
+TIME_BUDGET_MS = 400  # Wall-clock thinking time per move; keeps latency the same on slow and fast devices
+TT_SIZE_KB = 1024  # Memory for the transposition table, allocated once and never grown
+MAX_PLY = 64  # Deepest ply that keeps killer moves
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book.bin')  # Optional Polyglot opening book
+ENDGAME_WIN = CHECKMATE // 2  # Score of a table win, less the plies to mate; stays clear of any material score
+
+# Search enhancements, each switchable so node counts can be compared with and without it (epd.py --disable)
+PRINCIPAL_VARIATION_SEARCH = True
+NULL_MOVE_PRUNING = True
+LATE_MOVE_REDUCTIONS = True
+ASPIRATION_WINDOWS = True
+SEARCH_FEATURES = ('PRINCIPAL_VARIATION_SEARCH', 'NULL_MOVE_PRUNING', 'LATE_MOVE_REDUCTIONS', 'ASPIRATION_WINDOWS')
+NULL_MOVE_DEPTH = 3  # Shallowest depth at which passing the turn is tried
+NULL_MOVE_REDUCTION = 2  # Extra plies taken off the search after a pass
+LMR_DEPTH = 3  # Shallowest depth at which late quiet moves are reduced
+LMR_MOVES = 3  # Moves searched at full depth before reductions start
+ASPIRATION_DEPTH = 4  # First iteration searched inside a window around the last score
+ASPIRATION_WINDOW = 50  # Centipawns either side of the last score
+
+# Pawn structure terms as (middlegame, endgame) centipawns, from the pawn owner's side
+PAWN_HASH_SIZE = 1 << 14  # Entries in the pawn structure cache
+DOUBLED_PAWN = (-10, -20)  # Each pawn beyond the first on a file
+ISOLATED_PAWN = (-10, -15)  # No friendly pawn on either neighbouring file
+PASSED_PAWN = ((0, 0), (5, 10), (5, 15), (15, 30), (30, 55), (50, 90), (80, 140), (0, 0))  # By rank, counted from the owner's side
+BLOCKED_PASSED_PAWN = (-5, -20)  # A passed pawn with an enemy piece standing right in front of it
+# Fitted values from tune.py's weights.json, when there is one, replace the hand-set ones above
+DOUBLED_PAWN = tuple(EVALUATION_WEIGHTS.get('doubled_pawn', DOUBLED_PAWN))
+ISOLATED_PAWN = tuple(EVALUATION_WEIGHTS.get('isolated_pawn', ISOLATED_PAWN))
+PASSED_PAWN = tuple(map(tuple, EVALUATION_WEIGHTS.get('passed_pawn', PASSED_PAWN)))
+BLOCKED_PASSED_PAWN = tuple(EVALUATION_WEIGHTS.get('blocked_passed_pawn', BLOCKED_PASSED_PAWN))
+
+
+class TranspositionTable:
+    """
+    Fixed-size cache of search results keyed by GameState.zobrist_key.
+    Entries live in two flat 64-bit arrays (keys and packed data), so memory is
+    bounded by size_kb no matter how long the game runs. Slots are paired into
+    buckets of two; a new result replaces the entry from an older search or the
+    shallower one, so deep results from the current search survive. Each key slot
+    holds the key XORed with its data, so when processes share the arrays, an entry
+    half-written by one of them fails to match instead of handing back the wrong data.
+    """
+    EXACT = 0
+    LOWER_BOUND = 1  # Search failed high: score is at least this
+    UPPER_BOUND = 2  # Search failed low: score is at most this
+
+    ENTRY_BYTES = 16
+    SCORE_OFFSET = 1 << 19  # Scores are stored unsigned in 20 bits
+
+    def __init__(self, size_kb=TT_SIZE_KB):
+        self.size = self.slot_count(size_kb)
+        self.bucket_mask = self.size - 2
+        self.keys = array('Q', bytes(8 * self.size))
+        self.data = array('Q', bytes(8 * self.size))
+        self.generation = 1
+
+    @classmethod
+    def slot_count(cls, size_kb):
+        entries = max(2, size_kb * 1024 // cls.ENTRY_BYTES)
+        return 1 << (entries.bit_length() - 1)  # Power of two so a mask replaces the modulo
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.size))
+        self.data = array('Q', bytes(8 * self.size))
+        self.generation = 1
+
+    def new_search(self):
+        """Marks existing entries as older, so they are the first to be replaced"""
+        self.generation = self.generation % 255 + 1
+
+    def probe(self, key):
+        """Returns (depth, bound, score, move key) stored for key, or None"""
+        index = key & self.bucket_mask
+        keys = self.keys
+        data = self.data[index]
+        if keys[index] ^ data != key:
+            index += 1
+            data = self.data[index]
+            if keys[index] ^ data != key:
+                return None
+        return (data >> 36) & 0xFF, (data >> 44) & 0x3, ((data >> 16) & 0xFFFFF) - self.SCORE_OFFSET, data & 0xFFFF
+
+    def store(self, key, depth, bound, score, move):
+        index = key & self.bucket_mask
+        keys = self.keys
+        data = self.data
+        first_key, second_key = keys[index] ^ data[index], keys[index + 1] ^ data[index + 1]
+        if first_key != key and second_key != key:
+            # Neither slot holds this position: replace an entry from an older search, else the shallower one
+            first, second = data[index], data[index + 1]
+            first_old = first >> 46 != self.generation
+            second_old = second >> 46 != self.generation
+            if first_old != second_old:
+                index += second_old
+            else:
+                index += (second >> 36) & 0xFF < (first >> 36) & 0xFF
+        elif first_key != key:
+            index += 1
+        entry = (move & MOVE_KEY_MASK) | (score + self.SCORE_OFFSET) << 16 | depth << 36 | bound << 44 | self.generation << 46
+        keys[index] = key ^ entry
+        data[index] = entry
+
+
+transposition_table = TranspositionTable()
+
+
+def score_to_table(score, ply):
+    """
+    A mate score as the transposition table keeps it: counted in plies from the node rather
+    than the root, so it still holds when the position recurs at another ply
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """A score read from the transposition table at ply, mates counted from the root again"""
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def mate_distance(score):
+    """Moves to mate for a mate score from the side to move, negative when it is the side mated; else None"""
+    if abs(score) < MATE_BOUND:
+        return None
+    moves = (CHECKMATE - abs(score) + 1) // 2
+    return moves if score > 0 else -moves
+
+
+FILE_MASKS = tuple(FILE_A << column for column in range(8))
+ADJACENT_FILES = tuple((FILE_MASKS[column - 1] if column > 0 else 0) | (FILE_MASKS[column + 1] if column < 7 else 0)
+                       for column in range(8))
+
+
+def passed_pawn_spans(white):
+    """For each square, the squares ahead of a pawn there on its own and neighbouring files"""
+    spans = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        rows = range(row) if white else range(row + 1, 8)
+        files = FILE_MASKS[column] | ADJACENT_FILES[column]
+        spans.append(sum(1 << (ahead * 8) for ahead in rows) * 0xFF & files)
+    return tuple(spans)
+
+
+WHITE_PASSED_SPANS = passed_pawn_spans(True)  # White pawns move towards row 0
+BLACK_PASSED_SPANS = passed_pawn_spans(False)
+
+
+def count_pawn_terms(white_pawns, black_pawns):
+    """
+    White minus Black counts of the pawn structure terms: (doubled, isolated, passed by rank
+    from the owner's side, white passed pawns, black passed pawns). Of a doubled pair only
+    the front pawn can be passed.
+    """
+    doubled = isolated = 0
+    passed_ranks = [0] * 8
+    passed = [0, 0]
+    for side, (pawns, enemy_pawns, spans, sign) in enumerate(((white_pawns, black_pawns, WHITE_PASSED_SPANS, 1),
+                                                             (black_pawns, white_pawns, BLACK_PASSED_SPANS, -1))):
+        for file_mask in FILE_MASKS:
+            extra = (pawns & file_mask).bit_count() - 1
+            if extra > 0:
+                doubled += sign * extra
+        for square in squares_of(pawns):
+            column = square & 7
+            if not pawns & ADJACENT_FILES[column]:
+                isolated += sign
+            span = spans[square]
+            if not enemy_pawns & span and not pawns & span & FILE_MASKS[column]:
+                passed[side] |= 1 << square
+                passed_ranks[7 - (square >> 3) if sign > 0 else square >> 3] += sign
+    return doubled, isolated, passed_ranks, passed[0], passed[1]
+
+
+def evaluate_pawns(white_pawns, black_pawns):
+    """
+    Pawn structure score from White's side: doubled, isolated and passed pawns, scored
+    separately for the middlegame and the endgame. Returns (middlegame, endgame, white
+    passed pawns, black passed pawns).
+    """
+    doubled, isolated, passed_ranks, white_passed, black_passed = count_pawn_terms(white_pawns, black_pawns)
+    middlegame = doubled * DOUBLED_PAWN[0] + isolated * ISOLATED_PAWN[0]
+    endgame = doubled * DOUBLED_PAWN[1] + isolated * ISOLATED_PAWN[1]
+    for count, bonus in zip(passed_ranks, PASSED_PAWN):
+        if count:
+            middlegame += count * bonus[0]
+            endgame += count * bonus[1]
+    return middlegame, endgame, white_passed, black_passed
+
+
+class PawnHashTable:
+    """
+    Cache of evaluate_pawns results keyed by GameState.pawn_key. Pawns move far less often
+    than pieces, so nearly every position the search scores has a pawn structure already
+    seen and the hit rate runs high. Direct-mapped with a fixed number of entries, each a
+    (key, middlegame, endgame, white passed, black passed) tuple. An empty slot reads as
+    key 0 with nothing in it, which is the right entry for a position without pawns.
+    """
+
+    def __init__(self, size=PAWN_HASH_SIZE):
+        self.size = size
+        self.mask = size - 1
+        self.clear()
+
+    def clear(self):
+        self.entries = [(0, 0, 0, 0, 0)] * self.size
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, gs):
+        """Returns the cached entry for the pawns of gs, evaluating and storing them on a miss"""
+        key = gs.pawn_key
+        index = key & self.mask
+        entry = self.entries[index]
+        self.probes += 1
+        if entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = (key,) + evaluate_pawns(gs.bitboards['wP'], gs.bitboards['bP'])
+        self.entries[index] = entry
+        return entry
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+pawn_table = PawnHashTable()
+
+
+class MoveOrderer:
+    """
+    Sorts moves so the best ones are likely searched first and alpha-beta cuts off early:
+    the hash move, then captures by most valuable victim / least valuable attacker,
+    then the two killer moves of the ply, then quiet moves by their history score.
+    Also counts how often the first move searched was the one that cut off.
+    """
+    VALUES = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 10}
+    CODE_VALUES = (0,) + tuple(map(VALUES.get, PIECE_TYPES)) * 2  # By piece code: empty, white pieces, black pieces
+    HASH_MOVE = 1 << 30
+    CAPTURE = 1 << 28
+    KILLERS = (1 << 27, 1 << 26)
+    HISTORY_LIMIT = 1 << 25  # History scores are halved before reaching the killer band
+    FROM_TO_MASK = (1 << PROMOTION_SHIFT) - 1  # Start and end squares of a move, indexing the history table
+
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]  # Move keys of quiet moves that cut off at each ply
+        self.history = ([0] * 4096, [0] * 4096)  # Per side, indexed by start and end square
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """Forgets killers and ages the history, so the last position's experience fades"""
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        for history in self.history:
+            for index, score in enumerate(history):
+                if score:
+                    history[index] = score >> 1
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order(self, moves, hash_move, ply, white_to_move):
+        """Sorts moves in place, best first; hash_move is the MOVE_KEY_MASK part of the table move"""
+        first_killer, second_killer = self.killers[ply]
+        history = self.history[white_to_move]
+        mvv_lva = self.mvv_lva
+        from_to_mask = self.FROM_TO_MASK
+
+        def move_score(move):
+            key = move & MOVE_KEY_MASK
+            if key == hash_move:
+                return self.HASH_MOVE
+            if move & TACTICAL_MASK:
+                return self.CAPTURE + mvv_lva(move)
+            if key == first_killer:
+                return self.KILLERS[0]
+            if key == second_killer:
+                return self.KILLERS[1]
+            return history[move & from_to_mask]
+
+        moves.sort(key=move_score, reverse=True)
+
+    def mvv_lva(self, move):
+        """Most valuable victim first, and among equal victims the least valuable attacker"""
+        values = self.CODE_VALUES
+        victim = values[move >> CAPTURED_SHIFT & PIECE_MASK]
+        if move >> PROMOTION_SHIFT & PIECE_MASK:
+            victim += self.VALUES['Q']
+        return victim * 16 - values[move >> MOVED_SHIFT & PIECE_MASK]
+
+    def record_cutoff(self, move, move_index, depth, ply, white_to_move):
+        """Called when move caused a beta cutoff after move_index earlier moves"""
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+        if move & TACTICAL_MASK:
+            return  # Captures are already ordered by MVV-LVA
+        killers = self.killers[ply]
+        key = move & MOVE_KEY_MASK
+        if killers[0] != key:
+            killers[1] = killers[0]
+            killers[0] = key
+        history = self.history[white_to_move]
+        index = move & self.FROM_TO_MASK
+        history[index] += depth * depth
+        if history[index] > self.HISTORY_LIMIT:
+            for history in self.history:
+                for index, score in enumerate(history):
+                    history[index] = score >> 1
+
+    def first_move_cutoff_rate(self):
+        """Share of beta cutoffs produced by the first move searched; near 1.0 means ordering works"""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+
+move_orderer = MoveOrderer()
+
+
+class PrincipalVariationTable:
+    """
+    Triangular table of the best line found from each ply: row ply holds moves for plies
+    ply, ply + 1, ... and is rebuilt from the row below whenever a move raises alpha,
+    so row 0 ends up holding the principal variation of the whole search.
+    """
+
+    def __init__(self):
+        self.moves = [[0] * MAX_PLY for _ in range(MAX_PLY)]
+        self.lengths = [0] * MAX_PLY
+
+    def start(self, ply):
+        """Empties the line at ply; called as a node is entered"""
+        if ply < MAX_PLY:
+            self.lengths[ply] = ply
+
+    def update(self, ply, move):
+        """move is the new best at ply: the line becomes move followed by the line found below it"""
+        if ply >= MAX_PLY:
+            return
+        row = self.moves[ply]
+        row[ply] = move
+        child = ply + 1
+        length = self.lengths[child] if child < MAX_PLY else child
+        row[child:length] = self.moves[child][child:length]
+        self.lengths[ply] = max(length, child)
+
+    def line(self):
+        """The principal variation from the root, as move ints"""
+        return self.moves[0][:self.lengths[0]]
+
+
+pv_table = PrincipalVariationTable()
+principal_variation = []  # Line of the last completed iteration, its first move being next_move
+principal_lines = []  # (score, line) of each of the best lines of the last completed iteration, best first
+
+
+class SearchStats:
+    """
+    What the current (or last) search did, for tuning: node counts, transposition table
+    use, move ordering quality and the cost of each iteration. search_best_move resets it,
+    so read it during a search or after one. Times are wall-clock, so for a search spread
+    across frames they include the frames in between.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.start = time.perf_counter()
+        self.nodes = 0  # Full-width nodes, including the horizon nodes quiescence starts from
+        self.qnodes = 0  # Quiescence nodes, so horizon nodes count in both, as they do for TimeManager
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0  # Hits deep enough to answer the node without searching it
+        pawn_table.reset_counters()
+        self.iterations = []  # (depth, nodes, ms) for each completed iteration
+        self.iteration_nodes = 0  # Node count and time when the current iteration started
+        self.iteration_start = self.start
+
+    def finish_iteration(self, depth):
+        now = time.perf_counter()
+        total = self.nodes + self.qnodes
+        self.iterations.append((depth, total - self.iteration_nodes, (now - self.iteration_start) * 1000))
+        self.iteration_nodes = total
+        self.iteration_start = now
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def nodes_per_second(self):
+        return (self.nodes + self.qnodes) * 1000 / max(self.elapsed_ms(), 1e-6)
+
+    def effective_branching_factor(self):
+        """Nodes of the last iteration over nodes of the one before; 0.0 until two have finished"""
+        if len(self.iterations) < 2 or not self.iterations[-2][1]:
+            return 0.0
+        return self.iterations[-1][1] / self.iterations[-2][1]
+
+    def summary(self):
+        """All the counters as a dict, plus the move orderer's first-move cutoff rate"""
+        return {'depth': self.iterations[-1][0] if self.iterations else 0, 'nodes': self.nodes, 'qnodes': self.qnodes,
+                'nps': self.nodes_per_second(), 'tt_probes': self.tt_probes, 'tt_hits': self.tt_hits,
+                'tt_cutoffs': self.tt_cutoffs, 'pawn_probes': pawn_table.probes, 'pawn_hits': pawn_table.hits,
+                'ebf': self.effective_branching_factor(),
+                'first_move_cutoff_rate': move_orderer.first_move_cutoff_rate(),
+                'iteration_ms': [ms for _, _, ms in self.iterations], 'elapsed_ms': self.elapsed_ms()}
+
+    def lines(self):
+        """The summary as short text lines, for a debug overlay"""
+        stats = self.summary()
+        hit_rate = stats['tt_hits'] / stats['tt_probes'] if stats['tt_probes'] else 0.0
+        return [f"depth {stats['depth']}  {stats['elapsed_ms']:.0f} ms",
+                f"nodes {stats['nodes']}  qnodes {stats['qnodes']}",
+                f"nps {stats['nps']:.0f}",
+                f"tt hits {hit_rate:.0%}  cutoffs {stats['tt_cutoffs']}",
+                f"pawn hits {pawn_table.hit_rate():.0%}",
+                f"ebf {stats['ebf']:.2f}  1st cut {stats['first_move_cutoff_rate']:.0%}",
+                'ms/iter ' + ' '.join(f'{ms:.0f}' for ms in stats['iteration_ms'])]
+
+
+search_stats = SearchStats()
+
+
+def load_opening_book(path=BOOK_PATH):
+    """Opens the Polyglot book at path for the AI to play from; without one the AI searches every move"""
+    global opening_book
+    if opening_book is not None:
+        opening_book.close()
+    try:
+        opening_book = OpeningBook(path)
+    except OSError:
+        opening_book = None
+    return opening_book
+
+
+opening_book = None
+load_opening_book()
+endgame_tables = EndgameTables(os.path.dirname(BOOK_PATH))  # kqk.bin, krk.bin and kpk.bin from endgames.py
+
+
+def endgame_score(gs):
+    """Exact score for the side to move from the endgame tables, or None if they do not cover gs"""
+    distance = endgame_tables.probe(gs)
+    if distance is None:
+        return None
+    if distance > 0:
+        return ENDGAME_WIN - distance
+    if distance < 0:
+        return -ENDGAME_WIN - distance
+    return STALEMATE
+
+
+def endgame_move(gs):
+    """
+    The quickest mate, or longest defence, among gs's moves when the endgame tables cover gs.
+    Returns None for any other position, which is then searched as usual.
+    """
+    if endgame_tables.probe(gs) is None:
+        return None
+    best_move = None
+    max_score = -CHECKMATE
+    for move in gs.get_valid_moves():
+        gs.make_move(move)
+        score = endgame_score(gs)
+        if score is None:  # Not covered after the move: it mated
+            gs.get_valid_moves()
+            score = -CHECKMATE if gs.checkmate else STALEMATE
+        gs.undo_move()
+        if -score > max_score or best_move is None:
+            max_score = -score
+            best_move = move
+    return best_move
+
+
+def prepared_move(gs, use_book):
+    """A move that needs no search: from the opening book, or solved by the endgame tables"""
+    if use_book and opening_book is not None:
+        book_move = opening_book.pick_move(gs)
+        if book_move is not None:
+            return book_move
+    return endgame_move(gs)
+
+
+class TimeManager:
+    """
+    Wall-clock budget for one search, and optionally a node budget. Every node polls it
+    once, which is also how nodes are counted, and unwinds as soon as it runs out.
+    A search driven frame by frame also gets a slice deadline, after which it pauses
+    until the next frame.
+    """
+
+    def __init__(self, budget_ms, node_limit=math.inf):
+        self.start = time.perf_counter()
+        self.deadline = self.start + budget_ms / 1000
+        self.slice_deadline = math.inf
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.stopped = False
+
+    def check(self):
+        self.nodes += 1
+        if not self.stopped and (time.perf_counter() >= self.deadline or self.nodes >= self.node_limit):
+            self.stopped = True
+        return self.stopped
+
+    def slice_used_up(self):
+        return time.perf_counter() >= self.slice_deadline
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+
+class SearchTask:
+    """
+    An AI search spread across animation frames: call step() once per frame until it
+    returns True, then play best_move. The search works on a private copy of the game,
+    so the board on screen never shows its trial moves. A position found in the opening
+    book or the endgame tables is done straight away. Asked for more than one line, it
+    skips those shortcuts and leaves the best lines found in lines, as principal_lines.
+    Given a ponder_move, it searches the position after that move instead, with no time
+    limit until ponder_hit() is called once the move is really played; key is the
+    Zobrist key of the position searched, to tell whether it was.
+    """
+
+    def __init__(self, gs, time_budget_ms=TIME_BUDGET_MS, max_depth=MAX_DEPTH, use_book=True, lines=1,
+                 ponder_move=None):
+        self.lines = []
+        self.time_budget_ms = time_budget_ms
+        if ponder_move is not None:
+            gs = copy.deepcopy(gs)
+            gs.make_move(ponder_move)
+        self.key = gs.zobrist_key
+        self.best_move = prepared_move(gs, use_book) if lines == 1 else None
+        self.done = self.best_move is not None
+        if self.done:
+            return
+        self.gs = gs if ponder_move is not None else copy.deepcopy(gs)
+        valid_moves = self.gs.get_valid_moves()
+        if not valid_moves:  # Only possible after a ponder move that ends the game
+            self.done = True
+            return
+        self.time_manager = TimeManager(math.inf if ponder_move is not None else time_budget_ms)
+        self.search = search_best_move(self.gs, valid_moves, max_depth, lines=lines)
+
+    def ponder_hit(self):
+        """The pondered move was played: the time budget now applies, counted from when pondering began"""
+        if not self.done:
+            self.time_manager.deadline = self.time_manager.start + self.time_budget_ms / 1000
+
+    def step(self, slice_ms):
+        """Runs the search for at most slice_ms; returns True once it has finished"""
+        global time_manager
+        if self.done:
+            return True
+        time_manager = self.time_manager
+        time_manager.slice_deadline = time.perf_counter() + slice_ms / 1000
+        try:
+            next(self.search)
+        except StopIteration as finished:
+            self.done = True
+            self.best_move = finished.value
+            self.lines = principal_lines
+        return self.done
+
+
+def expected_reply(gs, line):
+    """
+    The move to ponder on once the AI has played line[0] and gs is the position after it:
+    the line's next move, else the best move the transposition table holds for gs (a line
+    can stop short at a leaf). None when neither gives a legal move.
+    """
+    valid_moves = gs.get_valid_moves()
+    if len(line) > 1 and line[1] in valid_moves:
+        return line[1]
+    entry = transposition_table.probe(gs.zobrist_key)
+    if entry is not None and entry[3]:
+        for move in valid_moves:
+            if move & MOVE_KEY_MASK == entry[3]:
+                return move
+    return None
+
+
+def find_best_move(gs, valid_moves, time_budget_ms=TIME_BUDGET_MS, max_depth=MAX_DEPTH, on_iteration=None,
+                   use_book=True, node_limit=math.inf, lines=1):
+    """
+    Runs a whole search in one go and returns the best move; see SearchTask for the frame-sliced
+    form. With lines above 1 the best lines are left in principal_lines.
+    """
+    global time_manager
+    move = prepared_move(gs, use_book) if lines == 1 else None
+    if move is not None:
+        return move
+    time_manager = TimeManager(time_budget_ms, node_limit)
+    for _ in search_best_move(gs, valid_moves, max_depth, on_iteration, lines):
+        pass
+    return next_move
+
+
+def search_best_move(gs, valid_moves, max_depth=MAX_DEPTH, on_iteration=None, lines=1, store=True):
+    """
+    Iterative deepening: searches depth 1, 2, 3... until time_manager stops it and
+    returns the best move of the deepest completed iteration. Each completed iteration
+    publishes its move in next_move, its line in principal_variation and, if given,
+    calls on_iteration(depth, move, score, elapsed_ms). From ASPIRATION_DEPTH on, each
+    iteration first searches a narrow window around the last score, and only widens
+    it on the side that failed.
+    With lines above 1 (multi-PV), each iteration goes on to search the root again
+    without the moves already chosen, once per extra line, all sharing the transposition
+    table; the lines land in principal_lines. An iteration cut short in the middle of
+    that is dropped like any other.
+    store is False when valid_moves is only some of the position's moves (as for one worker of
+    a split search), so no root result is stored as if it were the position's.
+    This is a generator that yields whenever the current slice is used up, so the caller
+    decides when it resumes.
+    """
+    global next_move, principal_variation, principal_lines
+    next_move = None
+    principal_variation = []
+    principal_lines = []
+    random.shuffle(valid_moves)  # Equal moves keep a random order, so the AI does not always play the same game
+    transposition_table.new_search()
+    move_orderer.new_search()
+    search_stats.reset()
+    entry = transposition_table.probe(gs.zobrist_key)
+    move_orderer.order(valid_moves, entry[3] if entry else 0, 0, gs.white_to_move)
+
+    score = 0
+    for depth in range(1, max_depth + 1):
+        alpha, beta = -CHECKMATE, CHECKMATE
+        if ASPIRATION_WINDOWS and depth >= ASPIRATION_DEPTH and abs(score) < ENDGAME_WIN:
+            alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+        while True:
+            move, score = yield from find_root_move(gs, valid_moves, depth, alpha, beta, store)
+            if time_manager.stopped:
+                break
+            if score <= alpha and alpha > -CHECKMATE:
+                alpha = -CHECKMATE
+            elif score >= beta and beta < CHECKMATE:
+                beta = CHECKMATE
+            else:
+                break
+        found = [(score, pv_table.line() or [move])]
+        others = [other for other in valid_moves if other != move]
+        while len(found) < lines and others and not time_manager.stopped:
+            other_move, other_score = yield from find_root_move(gs, others, depth, store=False)
+            if not time_manager.stopped:
+                found.append((other_score, pv_table.line() or [other_move]))
+                others.remove(other_move)
+        if time_manager.stopped:
+            if next_move is None:  # Not even depth 1 finished: take the best root move searched so far
+                next_move = move
+            break
+        next_move = move
+        principal_variation = found[0][1]
+        principal_lines = found
+        search_stats.finish_iteration(depth)
+        if on_iteration is not None:
+            on_iteration(depth, move, score, time_manager.elapsed_ms())
+        for _, line in reversed(found):
+            valid_moves.remove(line[0])
+            valid_moves.insert(0, line[0])  # The next iteration searches the last best moves first
+        if abs(score) >= MATE_BOUND:
+            break  # Forced mate found, deeper search cannot improve on it
+    return next_move
+
+
+def find_root_move(gs, valid_moves, depth, alpha=-CHECKMATE, beta=CHECKMATE, store=True):
+    """
+    One iteration over the root moves within (alpha, beta); returns (best move, score).
+    A score at or outside the window is only a bound, and the caller searches again.
+    store is False when valid_moves leaves some moves out, as the result is then not
+    the position's.
+    """
+    turn_multiplier = 1 if gs.white_to_move else -1
+    original_alpha = alpha
+    max_score = -CHECKMATE
+    best_move = None
+    pv_table.start(0)
+    for move_index, move in enumerate(valid_moves):
+        gs.make_move(move)
+        if move_index == 0 or not PRINCIPAL_VARIATION_SEARCH:
+            score = -(yield from find_move_nega_max_alpha_beta(gs, depth - 1, 1, -beta, -alpha, -turn_multiplier))
+        else:
+            score = -(yield from find_move_nega_max_alpha_beta(gs, depth - 1, 1, -alpha - 1, -alpha, -turn_multiplier))
+            if alpha < score < beta:
+                score = -(yield from find_move_nega_max_alpha_beta(gs, depth - 1, 1, -beta, -alpha, -turn_multiplier))
+        gs.undo_move()
+        if time_manager.stopped:
+            break
+        if score > max_score or best_move is None:
+            max_score = score
+            best_move = move
+        if score > alpha:
+            alpha = score
+            pv_table.update(0, move)
+            if alpha >= beta:
+                break
+
+    if store and not time_manager.stopped and best_move is not None:
+        if max_score <= original_alpha:
+            bound = TranspositionTable.UPPER_BOUND
+        elif max_score >= beta:
+            bound = TranspositionTable.LOWER_BOUND
+        else:
+            bound = TranspositionTable.EXACT
+        transposition_table.store(gs.zobrist_key, depth, bound, max_score, best_move)
+    return best_move, max_score
+
+
+def find_move_nega_max_alpha_beta(gs, depth, ply, alpha, beta, turn_multiplier, null_move_allowed=True):
+    """
+    Scores the position from the side to move's point of view. Moves are generated only
+    when the transposition table cannot already answer. Returns 0 without storing anything
+    once the time manager has stopped the search; the caller discards that iteration.
+    Moves after the first are searched with a null window (principal variation search),
+    late quiet moves at reduced depth, and re-searched only if they beat alpha. Before any
+    move, passing the turn is tried: if even that fails high, the node is cut off.
+    A PV node (open window) never takes a transposition table cutoff, so the principal
+    variation it leaves in pv_table runs on past it.
+    """
+    pv_table.start(ply)
+    if time_manager.check():
+        return 0
+    if time_manager.slice_used_up():
+        yield  # Hand the frame back; the search resumes here on the next step
+    search_stats.nodes += 1
+    if gs.occupied.bit_count() <= 3:
+        score = endgame_score(gs)
+        if score is not None:
+            return score
+    original_alpha = alpha
+    key = gs.zobrist_key
+
+    entry = transposition_table.probe(key)
+    search_stats.tt_probes += 1
+    hash_move = 0
+    if entry is not None:
+        search_stats.tt_hits += 1
+        entry_depth, bound, score, hash_move = entry
+        score = score_from_table(score, ply)
+    if entry is not None and entry_depth >= depth and beta - alpha == 1:
+        if bound == TranspositionTable.EXACT:
+            search_stats.tt_cutoffs += 1
+            return score
+        elif bound == TranspositionTable.LOWER_BOUND:
+            alpha = max(alpha, score)
+        else:
+            beta = min(beta, score)
+        if alpha >= beta:
+            search_stats.tt_cutoffs += 1
+            return score
+
+    if depth == 0:
+        return (yield from quiescence_search(gs, alpha, beta, turn_multiplier, ply))
+
+    if NULL_MOVE_PRUNING and null_move_allowed and depth >= NULL_MOVE_DEPTH and abs(beta) < ENDGAME_WIN \
+            and has_pieces(gs) and not in_check(gs) and turn_multiplier * score_board(gs) >= beta:
+        gs.make_null_move()
+        score = -(yield from find_move_nega_max_alpha_beta(gs, depth - 1 - NULL_MOVE_REDUCTION, ply + 1, -beta,
+                                                           -beta + 1, -turn_multiplier, False))
+        gs.undo_null_move()
+        if time_manager.stopped:
+            return 0
+        if score >= beta:
+            return beta  # Even passing holds beta, so a real move would too
+
+    valid_moves = gs.get_valid_moves()
+    if len(valid_moves) == 0:
+        return ply - CHECKMATE if gs.checkmate else STALEMATE
+    node_in_check = gs.in_check  # Read now, the searches below overwrite it
+    killers = move_orderer.killers[ply]
+
+    move_orderer.order(valid_moves, hash_move, ply, gs.white_to_move)
+    max_score = -CHECKMATE
+    best_move = None
+    for move_index, move in enumerate(valid_moves):
+        gs.make_move(move)
+        if move_index == 0:
+            score = -(yield from find_move_nega_max_alpha_beta(gs, depth - 1, ply + 1, -beta, -alpha, -turn_multiplier))
+        else:
+            reduction = 0
+            if LATE_MOVE_REDUCTIONS and depth >= LMR_DEPTH and move_index >= LMR_MOVES and not node_in_check \
+                    and not move & TACTICAL_MASK and move & MOVE_KEY_MASK not in killers and not in_check(gs):
+                reduction = 1 if move_index < LMR_MOVES * 2 or depth < LMR_DEPTH * 2 else 2
+            window = -alpha - 1 if PRINCIPAL_VARIATION_SEARCH else -beta
+            score = -(yield from find_move_nega_max_alpha_beta(gs, depth - 1 - reduction, ply + 1, window, -alpha,
+                                                               -turn_multiplier))
+            if reduction and score > alpha:  # The reduced search may have missed something: look at full depth
+                score = -(yield from find_move_nega_max_alpha_beta(gs, depth - 1, ply + 1, window, -alpha,
+                                                                   -turn_multiplier))
+            if PRINCIPAL_VARIATION_SEARCH and alpha < score < beta:  # Better than the first move: get its exact score
+                score = -(yield from find_move_nega_max_alpha_beta(gs, depth - 1, ply + 1, -beta, -alpha,
+                                                                   -turn_multiplier))
+        gs.undo_move()
+        if time_manager.stopped:
+            return 0
+        if score > max_score or best_move is None:
+            max_score = score
+            best_move = move
+        if score > alpha:
+            alpha = score
+            pv_table.update(ply, move)
+            if alpha >= beta:
+                move_orderer.record_cutoff(move, move_index, depth, ply, gs.white_to_move)
+                break
+
+    if max_score <= original_alpha:
+        bound = TranspositionTable.UPPER_BOUND
+    elif max_score >= beta:
+        bound = TranspositionTable.LOWER_BOUND
+    else:
+        bound = TranspositionTable.EXACT
+    transposition_table.store(key, depth, bound, score_to_table(max_score, ply), best_move)
+    return max_score
+
+
+def in_check(gs):
+    """Whether the side to move is in check, without generating its moves"""
+    row, column = gs.white_king_location if gs.white_to_move else gs.black_king_location
+    return gs.attackers_of(row * 8 + column, 'b' if gs.white_to_move else 'w', gs.occupied) != 0
+
+
+def has_pieces(gs):
+    """Whether the side to move has more than king and pawns; without, a null move can miss zugzwang"""
+    color = 'w' if gs.white_to_move else 'b'
+    bitboards = gs.bitboards
+    return (bitboards[color + 'N'] | bitboards[color + 'B'] | bitboards[color + 'R'] | bitboards[color + 'Q']) != 0
+
+
+def quiescence_search(gs, alpha, beta, turn_multiplier, ply):
+    """
+    Resolves captures at the horizon so a position is never scored in the middle of an exchange.
+    The side to move may stand pat on the static score; captures the static exchange evaluator
+    says lose material are skipped. When in check every evasion is searched instead.
+    """
+    if time_manager.check():
+        return 0
+    if time_manager.slice_used_up():
+        yield
+    search_stats.qnodes += 1
+
+    valid_moves = gs.get_valid_moves()
+    if len(valid_moves) == 0:
+        return ply - CHECKMATE if gs.checkmate else STALEMATE
+    stand_pat = turn_multiplier * score_board(gs)
+    node_in_check = gs.in_check  # Read now, the searches below overwrite it
+    if node_in_check:
+        max_score = -CHECKMATE
+        moves = valid_moves
+    else:
+        if stand_pat >= beta:
+            return stand_pat
+        max_score = stand_pat
+        alpha = max(alpha, stand_pat)
+        moves = [move for move in valid_moves if move & TACTICAL_MASK]
+    moves.sort(key=move_orderer.mvv_lva, reverse=True)
+
+    for move in moves:
+        if not node_in_check and gs.static_exchange(move, piece_score) < 0:
+            continue  # Losing capture
+        gs.make_move(move)
+        score = -(yield from quiescence_search(gs, -beta, -alpha, -turn_multiplier, ply + 1))
+        gs.undo_move()
+        if time_manager.stopped:
+            return 0
+        if score > max_score:
+            max_score = score
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+    return max_score
+
+
+def score_board(gs):
+    """
+    Static score from White's side in centipawns. Material and piece-square sums are kept
+    up to date by GameState as moves are made and pawn structure comes from pawn_table,
+    so this adds the two, docks passed pawns an enemy piece blockades, and blends the
+    middlegame and endgame scores by how much material is left.
+    """
+    if gs.checkmate:
+        if gs.white_to_move:
+            return -CHECKMATE
+        else:
+            return CHECKMATE
+    if gs.stalemate:
+        return STALEMATE
+
+    _, middlegame, endgame, white_passed, black_passed = pawn_table.probe(gs)
+    blocked = ((white_passed >> 8) & gs.occupancy['b']).bit_count() - ((black_passed << 8) & gs.occupancy['w']).bit_count()
+    middlegame += gs.middlegame_score + blocked * BLOCKED_PASSED_PAWN[0]
+    endgame += gs.endgame_score + blocked * BLOCKED_PASSED_PAWN[1]
+    phase = min(gs.phase, TOTAL_PHASE)  # Early promotions can push the phase past the start position
+    return (middlegame * phase + endgame * (TOTAL_PHASE - phase)) // TOTAL_PHASE
@@ -0,0 +1,138 @@
+"""
+Builds the KQK, KRK and KPK distance-to-mate tables the AI probes (see EndgameTables in engine.py)
+by retrograde analysis. Runs offline under plain CPython and writes kqk.bin, krk.bin and kpk.bin
+next to this file:
+
+    python endgames.py                       # All three tables
+    python endgames.py --tables kqk krk
+    python endgames.py --output /tmp/tables
+
+Every position's moves come from GameState itself, so the tables follow exactly the rules the game
+plays by, including its queen-only promotion. Checkmates are solved first; from there each solved
+position settles its predecessors, one distance at a time: a position with the strong side to move
+wins as soon as one move reaches a lost position, one with the lone king to move is lost once every
+move does. KPK promotes into KQK, so KQK is built first.
+"""
+
+import argparse
+import os
+import time
+
+from engine import (ENDGAME_TABLE_SIZES, KING_TARGETS, KING_TRIANGLE, PAWN_SQUARES, SQUARE_COORDINATES, GameState,
+                    endgame_index)
+
+
+TABLES = ('kqk', 'krk', 'kpk')
+MAX_PLIES = 254  # Bytes hold plies to mate plus one
+
+
+def decode(piece_type, index):
+    """(strong king, piece, weak king, strong side to move) for a table index, with the strong side as White"""
+    first, second = index >> 13, index >> 7 & 63
+    if piece_type == 'P':
+        return second, PAWN_SQUARES[first], index >> 1 & 63, index & 1
+    return KING_TRIANGLE[first], second, index >> 1 & 63, index & 1
+
+
+def place(gs, piece_type, strong_king, square, weak_king, strong_to_move):
+    """Sets gs up as the decoded position; returns False if it cannot occur in a game"""
+    if len({strong_king, square, weak_king}) < 3 or KING_TARGETS[strong_king] & (1 << weak_king):
+        return False
+    gs.put_piece(strong_king, 'wK')
+    gs.put_piece(square, 'w' + piece_type)
+    gs.put_piece(weak_king, 'bK')
+    gs.white_king_location = SQUARE_COORDINATES[strong_king]
+    gs.black_king_location = SQUARE_COORDINATES[weak_king]
+    gs.white_to_move = bool(strong_to_move)
+    waiting_king = weak_king if strong_to_move else strong_king
+    if gs.attacked_squares('w' if gs.white_to_move else 'b', gs.occupied) & (1 << waiting_king):
+        clear(gs, strong_king, square, weak_king)  # The side that just moved would still be in check
+        return False
+    return True
+
+
+def clear(gs, *squares):
+    for square in squares:
+        gs.remove_piece(square)
+
+
+def generate(piece_type, promotion_table=None):
+    """
+    Returns the table for king and piece_type against king as a bytearray. promotion_table is the
+    finished KQK table, needed for KPK.
+    """
+    size = ENDGAME_TABLE_SIZES[piece_type]
+    gs = GameState.from_fen('8/8/8/8/8/8/8/8 w - - 0 1')
+    predecessors = [None] * size  # Index -> indices one move earlier, once per move that leads there
+    remaining = bytearray(size)  # Lone king to move: moves not yet known to lose
+    plies = [[] for _ in range(MAX_PLIES + 1)]  # Positions waiting to be solved at each distance to mate
+    table = bytearray(size)
+
+    for index in range(size):
+        strong_king, square, weak_king, strong_to_move = decode(piece_type, index)
+        if not place(gs, piece_type, strong_king, square, weak_king, strong_to_move):
+            continue
+        moves = gs.get_valid_moves()
+        if gs.checkmate:
+            plies[0].append(index)
+        elif not strong_to_move:
+            remaining[index] = len(moves)
+        for move in moves:
+            gs.make_move(move)
+            found = endgame_index(gs)
+            gs.undo_move()
+            if found is None:
+                continue  # The lone king took the piece: a draw, so this move never counts as lost
+            child_type, child, _ = found
+            if child_type == piece_type:
+                if predecessors[child] is None:
+                    predecessors[child] = []
+                predecessors[child].append(index)
+            elif promotion_table is not None and promotion_table[child]:
+                plies[promotion_table[child]].append(index)  # Promotes into a won KQK: mate one ply later
+        clear(gs, strong_king, square, weak_king)
+
+    for distance, solved in enumerate(plies):
+        for index in solved:
+            if table[index]:
+                continue  # Already solved at a shorter distance
+            table[index] = distance + 1
+            for predecessor in predecessors[index] or ():
+                if table[predecessor] or distance == MAX_PLIES:
+                    continue
+                if predecessor & 1:  # Strong side to move: the first lost reply found is the quickest mate
+                    plies[distance + 1].append(predecessor)
+                else:
+                    remaining[predecessor] -= 1
+                    if remaining[predecessor] == 0:  # Every reply loses; the last one found holds out longest
+                        plies[distance + 1].append(predecessor)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the chess AI's endgame tables")
+    parser.add_argument('--tables', nargs='+', choices=TABLES, default=TABLES, help="Tables to build")
+    parser.add_argument('--output', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Directory to write the tables to (default: next to this file)")
+    args = parser.parse_args()
+
+    queen_table = None
+    for name in TABLES:
+        if name not in args.tables and not (name == 'kqk' and 'kpk' in args.tables):
+            continue
+        piece_type = name[1].upper()
+        start = time.perf_counter()
+        table = generate(piece_type, queen_table)
+        if piece_type == 'Q':
+            queen_table = table
+        won = sum(1 for index, value in enumerate(table) if value and index & 1)
+        longest = max(table) - 1
+        print(f"{name}: {won} won positions with the strong side to move, longest mate {longest} plies "
+              f"({time.perf_counter() - start:.1f}s)")
+        if name in args.tables:
+            with open(os.path.join(args.output, name + '.bin'), 'wb') as table_file:
+                table_file.write(table)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,236 @@
 
+import json
+import os
+import random
+import struct
+
+try:
+    import mmap
+except ImportError:  # Not every Python build ships mmap; OpeningBook then reads the file instead
+    mmap = None
+
+
+# ==========================================
+# BITBOARD HELPERS
+# ==========================================
+# Squares are numbered row * 8 + column, matching board[row][column]:
+# bit 0 is a8 (top left of the canvas) and bit 63 is h1 (bottom right).
+
+FULL_BOARD = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+RANK_8 = 0xFF  # Row 0
+RANK_5 = RANK_8 << 24  # Row 3
+RANK_4 = RANK_8 << 32  # Row 4
+RANK_1 = RANK_8 << 56  # Row 7
+
+# Masks applied after a shift so pieces do not wrap around from one edge of the board to the other
+COLUMN_SHIFT_MASKS = {
+    -2: FULL_BOARD ^ (FILE_G | FILE_H),
+    -1: FULL_BOARD ^ FILE_H,
+    0: FULL_BOARD,
+    1: FULL_BOARD ^ FILE_A,
+    2: FULL_BOARD ^ (FILE_A | FILE_B),
+}
+
+# (row, column) steps. The first four are orthogonal, the last four diagonal
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+ORTHOGONALS = DIRECTIONS[:4]
+DIAGONALS = DIRECTIONS[4:]
+ORTHOGONAL_SHIFTS = tuple((row_step * 8 + column_step, COLUMN_SHIFT_MASKS[column_step])
+                          for row_step, column_step in ORTHOGONALS)
+DIAGONAL_SHIFTS = tuple((row_step * 8 + column_step, COLUMN_SHIFT_MASKS[column_step])
+                        for row_step, column_step in DIAGONALS)
+KNIGHT_STEPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+
+SQUARE_COORDINATES = tuple((square // 8, square % 8) for square in range(64))  # (row, column) of each square
+
+PIECE_TYPES = ('P', 'N', 'B', 'R', 'Q', 'K')
+PIECES = tuple(color + piece_type for color in 'wb' for piece_type in PIECE_TYPES)
+
+START_BOARD = (
+    ('bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'),
+    ('bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'),
+    ('--', '--', '--', '--', '--', '--', '--', '--'),
+    ('--', '--', '--', '--', '--', '--', '--', '--'),
+    ('--', '--', '--', '--', '--', '--', '--', '--'),
+    ('--', '--', '--', '--', '--', '--', '--', '--'),
+    ('wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP'),
+    ('wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR'))
+
+# Piece codes packed into moves: 0 is an empty square, then PIECES in order
+PIECE_CODES = ('--',) + PIECES
+PIECE_CODE = {piece: code for code, piece in enumerate(PIECE_CODES)}
+
+
+# ==========================================
+# MOVE ENCODING
+# ==========================================
+# A move is a single int: start square | end square << 6 | promotion piece type << 12 | flags |
+# moving piece code << 18 | captured piece code << 22. The search keeps moves in this form so
+# nothing is allocated per move; Move builds a readable view of one for notation and the UI.
+
+END_SHIFT = 6
+PROMOTION_SHIFT = 12  # Index into PIECE_TYPES of the piece promoted to, 0 if none
+EN_PASSANT_FLAG = 1 << 16
+CASTLE_FLAG = 1 << 17
+MOVED_SHIFT = 18
+CAPTURED_SHIFT = 22
+MOVE_BITS = 26
+SQUARE_MASK = 0x3F
+PIECE_MASK = 0xF
+MOVE_KEY_MASK = 0xFFFF  # Start, end and promotion: enough to tell the moves of one position apart
+TACTICAL_MASK = (PIECE_MASK << PROMOTION_SHIFT) | (PIECE_MASK << CAPTURED_SHIFT)  # Set for captures and promotions
+QUEEN_PROMOTION = PIECE_TYPES.index('Q') << PROMOTION_SHIFT
+
+# Castling rights bits, in the order ZOBRIST_CASTLE_KEYS is indexed by
+WHITE_KING_SIDE = 1
+WHITE_QUEEN_SIDE = 2
+BLACK_KING_SIDE = 4
+BLACK_QUEEN_SIDE = 8
+ALL_CASTLE_RIGHTS = 15
+# Rights left after a move from or to each square: moving a king or rook, or capturing a rook, loses them
+CASTLE_RIGHTS_KEPT = tuple(
+    ALL_CASTLE_RIGHTS ^ {60: WHITE_KING_SIDE | WHITE_QUEEN_SIDE, 63: WHITE_KING_SIDE, 56: WHITE_QUEEN_SIDE,
+                         4: BLACK_KING_SIDE | BLACK_QUEEN_SIDE, 7: BLACK_KING_SIDE, 0: BLACK_QUEEN_SIDE}.get(square, 0)
+    for square in range(64))
+
+NO_SQUARE = 64  # En passant square when no en passant capture is possible
+UNDO_STACK_SIZE = 512  # Plies preallocated for the undo stack; it doubles if a game runs longer
+
+
+def shift(bitboard, row_step, column_step):
+    """Moves every set square by (row_step, column_step), dropping squares that leave the board"""
+    amount = row_step * 8 + column_step
+    if amount > 0:
+        bitboard <<= amount
+    else:
+        bitboard >>= -amount
+    return bitboard & COLUMN_SHIFT_MASKS[column_step]
+
+
+def knight_attacks(bitboard):
+    one_left = (bitboard >> 1) & COLUMN_SHIFT_MASKS[-1]
+    one_right = (bitboard << 1) & COLUMN_SHIFT_MASKS[1]
+    two_left = (bitboard >> 2) & COLUMN_SHIFT_MASKS[-2]
+    two_right = (bitboard << 2) & COLUMN_SHIFT_MASKS[2]
+    one = one_left | one_right
+    two = two_left | two_right
+    return ((one << 16) | (one >> 16) | (two << 8) | (two >> 8)) & FULL_BOARD
+
+
+def king_attacks(bitboard):
+    attacks = ((bitboard >> 1) & COLUMN_SHIFT_MASKS[-1]) | ((bitboard << 1) & COLUMN_SHIFT_MASKS[1])
+    bitboard |= attacks
+    return (attacks | (bitboard << 8) | (bitboard >> 8)) & FULL_BOARD
+
+
+def pawn_attacks(bitboard, white):
+    """Squares attacked by pawns on bitboard; white pawns attack up the board (towards row 0)"""
+    if white:
+        return ((bitboard >> 9) & COLUMN_SHIFT_MASKS[-1]) | ((bitboard >> 7) & COLUMN_SHIFT_MASKS[1])
+    return ((bitboard << 7) & COLUMN_SHIFT_MASKS[-1]) | ((bitboard << 9) & COLUMN_SHIFT_MASKS[1])
+
+
+def ray_attacks(bitboard, row_step, column_step, occupied):
+    """
+    Squares reached sliding from every set square in one direction, stopping on (and including)
+    the first occupied square. Works on a whole set of sliders at once.
+    """
+    amount = row_step * 8 + column_step
+    mask = COLUMN_SHIFT_MASKS[column_step]
+    empty = occupied ^ FULL_BOARD
+    attacks = 0
+    if amount > 0:
+        while bitboard:
+            bitboard = (bitboard << amount) & mask
+            attacks |= bitboard
+            bitboard &= empty
+    else:
+        while bitboard:
+            bitboard = (bitboard >> -amount) & mask
+            attacks |= bitboard
+            bitboard &= empty
+    return attacks
+
+
+def sliding_attacks(bitboard, shifts, occupied):
+    """Union of ray_attacks over several directions, given as (shift amount, wrap mask) pairs"""
+    empty = occupied ^ FULL_BOARD
+    attacks = 0
+    for amount, mask in shifts:
+        ray = bitboard
+        if amount > 0:
+            while ray:
+                ray = (ray << amount) & mask
+                attacks |= ray
+                ray &= empty
+        else:
+            while ray:
+                ray = (ray >> -amount) & mask
+                attacks |= ray
+                ray &= empty
+    return attacks
+
+
+def squares_of(bitboard):
+    """Yields the square index of every set bit, lowest first"""
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+
+def between_masks():
+    """Table of the squares strictly between two squares on a shared rank, file or diagonal (0 if not aligned)"""
+    table = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        row, column = SQUARE_COORDINATES[square]
+        for row_step, column_step in DIRECTIONS:
+            between = 0
+            end_row, end_column = row + row_step, column + column_step
+            while 0 <= end_row < 8 and 0 <= end_column < 8:
+                table[square][end_row * 8 + end_column] = between
+                between |= 1 << (end_row * 8 + end_column)
+                end_row += row_step
+                end_column += column_step
+    return tuple(tuple(masks) for masks in table)
+
+
+BETWEEN_SQUARES = between_masks()  # BETWEEN_SQUARES[king][checker]: where a check can be blocked
+
+# Attack sets of a single piece, computed once per square so move generation only indexes into them
+KNIGHT_TARGETS = tuple(knight_attacks(1 << square) for square in range(64))
+KING_TARGETS = tuple(king_attacks(1 << square) for square in range(64))
+# RAYS[direction][square]: every square from square to the edge in DIRECTIONS[direction], on an empty board
+RAYS = tuple(tuple(ray_attacks(1 << square, row_step, column_step, 0) for square in range(64))
+             for row_step, column_step in DIRECTIONS)
+DIRECTION_INDEX = {direction: index for index, direction in enumerate(DIRECTIONS)}
+# (rays, whether the direction runs towards higher squares) for each direction a rook or bishop slides in
+ORTHOGONAL_RAYS = tuple((RAYS[index], row_step * 8 + column_step > 0)
+                        for index, (row_step, column_step) in enumerate(ORTHOGONALS))
+DIAGONAL_RAYS = tuple((RAYS[index + 4], row_step * 8 + column_step > 0)
+                      for index, (row_step, column_step) in enumerate(DIAGONALS))
+
+
+def slider_attacks(square, occupied, rays):
+    """
+    Squares a slider on square attacks along rays (ORTHOGONAL_RAYS or DIAGONAL_RAYS): each ray
+    is cut off past its first occupied square, found as the lowest or highest set blocker bit
+    depending on which way the ray runs.
+    """
+    attacks = 0
+    for ray_table, forward in rays:
+        ray = ray_table[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= ray_table[(blockers & -blockers).bit_length() - 1 if forward else blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
 class GameState:
     """
     Class responsible for storing information about the current state of the game.
@@ -8,24 +240,33 @@ class GameState:
 
     def __init__(self):
         """
-        The board is a 8x8 2d list. Each element has 2 characters.
-        1st character represents the colour of the piece (b/w).
-        2nd character represents the type of the piece.
-        "--" represents an empty space with no piece.
+        The position is stored as one 64-bit bitboard per piece ('wP', 'bN', ...),
+        an occupancy bitboard per colour, and a 64 square list of piece strings for
+        quick lookups. The familiar 8x8 list of two-character strings is still
+        available as self.board; it is derived lazily whenever the position changes.
         """
-        self.board = [
-            ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
-            ['bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'],
-            ['--', '--', '--', '--', '--', '--', '--', '--'],
-            ['--', '--', '--', '--', '--', '--', '--', '--'],
-            ['--', '--', '--', '--', '--', '--', '--', '--'],
-            ['--', '--', '--', '--', '--', '--', '--', '--'],
-            ['wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP'],
-            ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']]
+        self.bitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {'w': 0, 'b': 0}
+        self.occupied = 0
+        self.squares = ['--'] * 64
+        self._board_view = None
+        self.zobrist_key = 0  # Zobrist key of the position, updated incrementally by every piece placement and move
+        self.pawn_key = 0  # Zobrist key of the pawns alone, for caching pawn structure evaluation
+        # Material plus piece-square score (White positive) and game phase, kept up to date the same way
+        self.middlegame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+        for row in range(8):
+            for column in range(8):
+                if START_BOARD[row][column] != '--':
+                    self.put_piece(row * 8 + column, START_BOARD[row][column])
+
         self.move_functions = {'P': self.get_pawn_moves, 'R': self.get_rook_moves, 'N': self.get_knight_moves,
                                'B': self.get_bishop_moves, 'Q': self.get_queen_moves, 'K': self.get_king_moves}
         self.white_to_move = True
-        self.move_log = []
+        # One packed int per ply played: the move, plus the castling rights and en passant square before it
+        self.undo_stack = [0] * UNDO_STACK_SIZE
+        self.ply = 0
         self.white_king_location = (7, 4)
         self.black_king_location = (0, 4)
         self.checkmate = False
@@ -34,111 +275,235 @@ class GameState:
         self.pins = []
         self.checks = []
 
-        # En passant
-        self.en_passant_possible = ()  # Coordinates for square where en passant possible
-        self.en_passant_possible_log = [self.en_passant_possible]
+        self.en_passant_square = NO_SQUARE  # Square a pawn could capture onto en passant
+        self.castle_rights = ALL_CASTLE_RIGHTS  # WHITE_KING_SIDE | WHITE_QUEEN_SIDE | ... bits
+        self.zobrist_key ^= self.state_key()
 
-        # Castling
-        self.white_castle_king_side = True
-        self.white_castle_queen_side = True
-        self.black_castle_king_side = True
-        self.black_castle_queen_side = True
-        self.castle_rights_log = [CastleRights(self.white_castle_king_side, self.black_castle_king_side,
-                                               self.white_castle_queen_side, self.black_castle_queen_side)]
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Builds a position from Forsyth-Edwards Notation. The halfmove and fullmove counters
+        are accepted but not kept, since the engine has no fifty-move rule.
+        """
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"FEN needs at least 4 fields: {fen!r}")
+        placement, side, castling, en_passant = fields[:4]
+        rows = placement.split('/')
+        if len(rows) != 8 or side not in ('w', 'b'):
+            raise ValueError(f"Malformed FEN: {fen!r}")
+
+        gs = cls()
+        gs.zobrist_key ^= gs.state_key()  # Re-added once the new state is set
+        for square in squares_of(gs.occupied):
+            gs.remove_piece(square)
+        for row, rank in enumerate(rows):
+            column = 0
+            for char in rank:
+                if char.isdigit():
+                    column += int(char)
+                    continue
+                if char.upper() not in PIECE_TYPES or column > 7:
+                    raise ValueError(f"Malformed FEN: {fen!r}")
+                piece = ('w' if char.isupper() else 'b') + char.upper()
+                gs.put_piece(row * 8 + column, piece)
+                if piece == 'wK':
+                    gs.white_king_location = (row, column)
+                elif piece == 'bK':
+                    gs.black_king_location = (row, column)
+                column += 1
+            if column != 8:
+                raise ValueError(f"Malformed FEN: {fen!r}")
+
+        gs.white_to_move = side == 'w'
+        gs.castle_rights = ('K' in castling) * WHITE_KING_SIDE | ('Q' in castling) * WHITE_QUEEN_SIDE | \
+            ('k' in castling) * BLACK_KING_SIDE | ('q' in castling) * BLACK_QUEEN_SIDE
+        if en_passant != '-':
+            gs.en_passant_square = Move.ranks_to_rows[en_passant[1]] * 8 + Move.files_to_columns[en_passant[0]]
+        gs.zobrist_key ^= gs.state_key()
+        return gs
+
+    @property
+    def move_log(self):
+        """Moves played so far as Move views, oldest first"""
+        return [Move.from_code(entry & ((1 << MOVE_BITS) - 1)) for entry in self.undo_stack[:self.ply]]
+
+    @property
+    def board(self):
+        """8x8 list of piece strings for drawing and notation, rebuilt only after the position changes"""
+        if self._board_view is None:
+            self._board_view = [self.squares[i:i + 8] for i in range(0, 64, 8)]
+        return self._board_view
+
+    def put_piece(self, square, piece):
+        """Places piece on an empty square, keeping every bitboard in sync"""
+        bit = 1 << square
+        self.bitboards[piece] |= bit
+        self.occupancy[piece[0]] |= bit
+        self.occupied |= bit
+        self.squares[square] = piece
+        self.zobrist_key ^= ZOBRIST_PIECE_KEYS[piece][square]
+        self.pawn_key ^= ZOBRIST_PAWN_KEYS[piece][square]
+        self.middlegame_score += MIDDLEGAME_SCORES[piece][square]
+        self.endgame_score += ENDGAME_SCORES[piece][square]
+        self.phase += PIECE_PHASES[piece]
+        self._board_view = None
+
+    def remove_piece(self, square):
+        """Removes whatever piece stands on square and returns it"""
+        piece = self.squares[square]
+        bit = 1 << square
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece[0]] ^= bit
+        self.occupied ^= bit
+        self.squares[square] = '--'
+        self.zobrist_key ^= ZOBRIST_PIECE_KEYS[piece][square]
+        self.pawn_key ^= ZOBRIST_PAWN_KEYS[piece][square]
+        self.middlegame_score -= MIDDLEGAME_SCORES[piece][square]
+        self.endgame_score -= ENDGAME_SCORES[piece][square]
+        self.phase -= PIECE_PHASES[piece]
+        self._board_view = None
+        return piece
+
+    def move_piece(self, start, end):
+        """Slides the piece on start to the empty square end with a single XOR per bitboard"""
+        piece = self.squares[start]
+        squares = (1 << start) | (1 << end)
+        self.bitboards[piece] ^= squares
+        self.occupancy[piece[0]] ^= squares
+        self.occupied ^= squares
+        self.squares[start] = '--'
+        self.squares[end] = piece
+        keys = ZOBRIST_PIECE_KEYS[piece]
+        self.zobrist_key ^= keys[start] ^ keys[end]
+        keys = ZOBRIST_PAWN_KEYS[piece]
+        self.pawn_key ^= keys[start] ^ keys[end]
+        scores = MIDDLEGAME_SCORES[piece]
+        self.middlegame_score += scores[end] - scores[start]
+        scores = ENDGAME_SCORES[piece]
+        self.endgame_score += scores[end] - scores[start]
+        self._board_view = None
 
     def make_move(self, move):
-        """Takes a move as a parameter, executes it, and updates move log"""
-        global promoted_piece
-
-        self.board[move.start_row][move.start_column] = '--'  # When a piece is moved, the square it leaves is blank
-        self.board[move.end_row][move.end_column] = move.piece_moved  # Moves piece to new location
-        self.move_log.append(move)  # Logs move
-
-        if move.piece_moved == 'wK':
-            self.white_king_location = (move.end_row, move.end_column)
-        elif move.piece_moved == 'bK':
-            self.black_king_location = (move.end_row, move.end_column)
+        """Plays move (a packed move int) and pushes what undo_move needs onto the undo stack"""
+        self.zobrist_key ^= self.state_key()  # Castling, en passant and turn keys are re-added once updated
+        start = move & SQUARE_MASK
+        end = move >> END_SHIFT & SQUARE_MASK
+        if self.ply == len(self.undo_stack):
+            self.undo_stack.extend([0] * len(self.undo_stack))
+        self.undo_stack[self.ply] = move | self.castle_rights << MOVE_BITS | self.en_passant_square << (MOVE_BITS + 4)
+        self.ply += 1
+
+        if move & EN_PASSANT_FLAG:
+            self.remove_piece((start & ~7) | (end & 7))  # Capturing the pawn beside the start square
+        elif move >> CAPTURED_SHIFT & PIECE_MASK:
+            self.remove_piece(end)
+        self.move_piece(start, end)  # Moves piece to new location, leaving its old square blank
 
         # Pawn promotion
-        if move.is_pawn_promotion:
-            # For simplicity in this web port, always promote to Queen
-            promoted_piece = 'Q'
-            self.board[move.end_row][move.end_column] = move.piece_moved[0] + promoted_piece
-
-        # En passant
-        if move.is_en_passant_move:
-            self.board[move.start_row][move.end_column] = '--'  # Capturing the pawn
-
-        # Updates the en_passant_possible variable
-        if move.piece_moved[1] == 'P' and abs(move.start_row - move.end_row) == 2:  # Only valid for 2 square pawn moves
-            self.en_passant_possible = ((move.start_row + move.end_row) // 2, move.start_column)
+        promotion = move >> PROMOTION_SHIFT & PIECE_MASK
+        if promotion:
+            pawn = self.remove_piece(end)
+            self.put_piece(end, pawn[0] + PIECE_TYPES[promotion])
+
+        piece_moved = PIECE_CODES[move >> MOVED_SHIFT & PIECE_MASK]
+        if piece_moved == 'wK':
+            self.white_king_location = SQUARE_COORDINATES[end]
+        elif piece_moved == 'bK':
+            self.black_king_location = SQUARE_COORDINATES[end]
+
+        # Updates the en passant square; only valid for 2 square pawn moves
+        if piece_moved[1] == 'P' and abs(start - end) == 16:
+            self.en_passant_square = (start + end) // 2
         else:
-            self.en_passant_possible = ()
-
-        self.en_passant_possible_log.append(self.en_passant_possible)
+            self.en_passant_square = NO_SQUARE
 
         # Castling
-        if move.is_castle_move:
-            if move.end_column - move.start_column == 2:  # King side castle
-                self.board[move.end_row][move.end_column - 1] = self.board[move.end_row][
-                    move.end_column + 1]  # Moves rook
-                self.board[move.end_row][move.end_column + 1] = '--'  # Erases old rook
+        if move & CASTLE_FLAG:
+            if end > start:  # King side castle
+                self.move_piece(end + 1, end - 1)  # Moves rook
             else:  # Queen side castle
-                self.board[move.end_row][move.end_column + 1] = self.board[move.end_row][
-                    move.end_column - 2]  # Moves rook
-                self.board[move.end_row][move.end_column - 2] = '--'  # Erases old rook
-
-        # Updates castling rights
-        self.update_castle_rights(move)
-        self.castle_rights_log.append(CastleRights(self.white_castle_king_side, self.black_castle_king_side,
-                                                   self.white_castle_queen_side, self.black_castle_queen_side))
+                self.move_piece(end - 2, end + 1)  # Moves rook
 
+        self.castle_rights &= CASTLE_RIGHTS_KEPT[start] & CASTLE_RIGHTS_KEPT[end]
         self.white_to_move = not self.white_to_move  # Switches turns
+        self.zobrist_key ^= self.state_key()
 
     def undo_move(self):
         """Undos last move made"""
-        if len(self.move_log) != 0:  # Makes sure that there is a move to undo
-            move = self.move_log.pop()
-            self.board[move.start_row][move.start_column] = move.piece_moved
-            self.board[move.end_row][move.end_column] = move.piece_captured
+        if self.ply != 0:  # Makes sure that there is a move to undo
+            self.ply -= 1
+            entry = self.undo_stack[self.ply]
+            self.zobrist_key ^= self.state_key()
+            start = entry & SQUARE_MASK
+            end = entry >> END_SHIFT & SQUARE_MASK
+            piece_moved = PIECE_CODES[entry >> MOVED_SHIFT & PIECE_MASK]
+            captured = entry >> CAPTURED_SHIFT & PIECE_MASK
+            if entry >> PROMOTION_SHIFT & PIECE_MASK:
+                self.remove_piece(end)
+                self.put_piece(end, piece_moved)
+            self.move_piece(end, start)
+            if entry & EN_PASSANT_FLAG:
+                self.put_piece((start & ~7) | (end & 7), PIECE_CODES[captured])  # Landing square stays blank
+            elif captured:
+                self.put_piece(end, PIECE_CODES[captured])
             self.white_to_move = not self.white_to_move  # Switches turn back
 
             # Updates king positions
-            if move.piece_moved == 'wK':
-                self.white_king_location = (move.start_row, move.start_column)
-            elif move.piece_moved == 'bK':
-                self.black_king_location = (move.start_row, move.start_column)
-
-            # En passant
-            if move.is_en_passant_move:
-                self.board[move.end_row][move.end_column] = '--'  # Leaves landing square blank
-                self.board[move.start_row][move.end_column] = move.piece_captured  # Allows en passant on the next move
-            self.en_passant_possible_log.pop()
-            self.en_passant_possible = self.en_passant_possible_log[-1]
-
-            # Castling rights
-            self.castle_rights_log.pop()  # Gets rid of new castle rights from move undoing
-            castle_rights = self.castle_rights_log[-1]
-            self.white_castle_king_side = castle_rights.white_king_side
-            self.black_castle_king_side = castle_rights.black_king_side
-            self.white_castle_queen_side = castle_rights.white_queen_side
-            self.black_castle_queen_side = castle_rights.black_queen_side
+            if piece_moved == 'wK':
+                self.white_king_location = SQUARE_COORDINATES[start]
+            elif piece_moved == 'bK':
+                self.black_king_location = SQUARE_COORDINATES[start]
+
+            # Castling rights and en passant square from before the move
+            self.castle_rights = entry >> MOVE_BITS & ALL_CASTLE_RIGHTS
+            self.en_passant_square = entry >> (MOVE_BITS + 4) & 0x7F
 
             # Castling
-            if move.is_castle_move:
-                if move.end_column - move.start_column == 2:  # King side
-                    self.board[move.end_row][move.end_column + 1] = self.board[move.end_row][move.end_column - 1]
-                    self.board[move.end_row][move.end_column - 1] = '--'
+            if entry & CASTLE_FLAG:
+                if end > start:  # King side
+                    self.move_piece(end - 1, end + 1)
                 else:  # Queen side
-                    self.board[move.end_row][move.end_column - 2] = self.board[move.end_row][move.end_column + 1]
-                    self.board[move.end_row][move.end_column + 1] = '--'
+                    self.move_piece(end + 1, end - 2)
+            self.zobrist_key ^= self.state_key()
 
             self.checkmate = False
             self.stalemate = False
 
+    def make_null_move(self):
+        """Passes the turn without moving, for the search's null-move pruning; undo it with undo_null_move"""
+        self.zobrist_key ^= self.state_key()
+        if self.ply == len(self.undo_stack):
+            self.undo_stack.extend([0] * len(self.undo_stack))
+        self.undo_stack[self.ply] = self.castle_rights << MOVE_BITS | self.en_passant_square << (MOVE_BITS + 4)
+        self.ply += 1
+        self.en_passant_square = NO_SQUARE
+        self.white_to_move = not self.white_to_move
+        self.zobrist_key ^= self.state_key()
+
+    def undo_null_move(self):
+        self.ply -= 1
+        self.zobrist_key ^= self.state_key()
+        self.en_passant_square = self.undo_stack[self.ply] >> (MOVE_BITS + 4) & 0x7F
+        self.white_to_move = not self.white_to_move
+        self.zobrist_key ^= self.state_key()
+
+    def state_key(self):
+        """
+        Zobrist key of everything but the pieces: castling rights, side to move and the en passant
+        file (only counted when a pawn could actually take, as in the Polyglot book format)
+        """
+        key = ZOBRIST_CASTLE_KEYS[self.castle_rights]
+        if self.white_to_move:
+            key ^= ZOBRIST_TURN_KEY
+        if self.en_passant_square != NO_SQUARE:
+            capturers = self.bitboards['wP' if self.white_to_move else 'bP']
+            if pawn_attacks(1 << self.en_passant_square, not self.white_to_move) & capturers:
+                key ^= ZOBRIST_EN_PASSANT_KEYS[self.en_passant_square & 7]
+        return key
+
     def get_valid_moves(self):
         """Gets all moves considering checks"""
-        valid_moves = []
         self.in_check, self.pins, self.checks = self.check_for_pins_and_checks()
 
         # Updates king locations
@@ -148,26 +513,7 @@ class GameState:
             king_row, king_column = self.black_king_location[0], self.black_king_location[1]
 
         if self.in_check:
-            if len(self.checks) == 1:  # Only 1 check: block check or move king
-                valid_moves = self.get_all_possible_moves()
-                check = self.checks[0]
-                check_row, check_column = check[0], check[1]
-                piece_checking = self.board[check_row][check_column]  # Enemy piece causing check
-                valid_squares = []
-                if piece_checking == 'N':
-                    valid_squares = [(check_row, check_column)]
-                else:
-                    for i in range(1, len(self.board)):
-                        valid_square = (king_row + check[2] * i, king_column + check[3] * i)  # 2 & 3 = check directions
-                        valid_squares.append(valid_square)
-                        if valid_square[0] == check_row and valid_square[1] == check_column:
-                            break
-                for i in range(len(valid_moves) - 1, -1, -1):  # Gets rid of move not blocking, checking, or moving king
-                    if valid_moves[i].piece_moved[1] != 'K':
-                        if not (valid_moves[i].end_row, valid_moves[i].end_column) in valid_squares:
-                            valid_moves.remove(valid_moves[i])
-            else:  # Double check, king must move
-                self.get_king_moves(king_row, king_column, valid_moves)
+            valid_moves = self.get_check_evasions(king_row, king_column)
         else:  # Not in check
             valid_moves = self.get_all_possible_moves()
 
@@ -182,197 +528,208 @@ class GameState:
 
         return valid_moves
 
+    def get_check_evasions(self, king_row, king_column):
+        """
+        Generates only the legal replies to check: king moves out of attack and, against a single
+        checker, captures of it or interpositions on the squares between it and the king.
+        Pinned pieces are skipped, as they can never answer a check.
+        """
+        moves = []
+        ally = 'w' if self.white_to_move else 'b'
+        opponent = 'b' if self.white_to_move else 'w'
+        king_square = king_row * 8 + king_column
+        king = 1 << king_square
+        not_own = self.occupancy[ally] ^ FULL_BOARD
+        danger = self.attacked_squares(opponent, self.occupied ^ king)  # Lifts the king so sliders see through it
+        self.add_moves(king_square, KING_TARGETS[king_square] & not_own & ~danger, moves)
+        if len(self.checks) > 1:
+            return moves  # Double check, king must move
+
+        checker = self.checks[0][0] * 8 + self.checks[0][1]
+        targets = BETWEEN_SQUARES[king_square][checker] | (1 << checker)  # Knight and pawn checks cannot be blocked
+        pinned = 0
+        for pin in self.pins:
+            pinned |= 1 << (pin[0] * 8 + pin[1])
+        bitboards = self.bitboards
+        occupied = self.occupied
+        not_own &= targets
+
+        self.get_unpinned_pawn_moves(bitboards[ally + 'P'] & ~pinned, moves, targets)
+        for square in squares_of(bitboards[ally + 'N'] & ~pinned):
+            self.add_moves(square, KNIGHT_TARGETS[square] & not_own, moves)
+        for square in squares_of((bitboards[ally + 'B'] | bitboards[ally + 'Q']) & ~pinned):
+            self.add_moves(square, slider_attacks(square, occupied, DIAGONAL_RAYS) & not_own, moves)
+        for square in squares_of((bitboards[ally + 'R'] | bitboards[ally + 'Q']) & ~pinned):
+            self.add_moves(square, slider_attacks(square, occupied, ORTHOGONAL_RAYS) & not_own, moves)
+        return moves
+
+    def get_valid_move_views(self):
+        """get_valid_moves as Move views, for UI code that wants rows, columns and piece names"""
+        return [Move.from_code(move) for move in self.get_valid_moves()]
+
     def get_all_possible_moves(self):
         """Gets all moves without considering checks"""
         moves = []
-        for row in range(len(self.board)):  # Number of rows
-            for column in range(len(self.board[row])):  # Number of columns in each row
-                turn = self.board[row][column][0]
-                if (turn == 'w' and self.white_to_move) or (turn == 'b' and not self.white_to_move):
-                    piece = self.board[row][column][1]
-                    self.move_functions[piece](row, column, moves)  # Calls move function based on piece type
+        ally = 'w' if self.white_to_move else 'b'
+        bitboards = self.bitboards
+        occupied = self.occupied
+        not_own = self.occupancy[ally] ^ FULL_BOARD
+        pinned = 0
+        for pin in self.pins:
+            pinned |= 1 << (pin[0] * 8 + pin[1])
+
+        # Unpinned pieces go straight from attack sets to moves; pawns are handled all at once
+        self.get_unpinned_pawn_moves(bitboards[ally + 'P'] & ~pinned, moves)
+        for square in squares_of(bitboards[ally + 'N'] & ~pinned):
+            self.add_moves(square, KNIGHT_TARGETS[square] & not_own, moves)
+        for square in squares_of((bitboards[ally + 'B'] | bitboards[ally + 'Q']) & ~pinned):
+            self.add_moves(square, slider_attacks(square, occupied, DIAGONAL_RAYS) & not_own, moves)
+        for square in squares_of((bitboards[ally + 'R'] | bitboards[ally + 'Q']) & ~pinned):
+            self.add_moves(square, slider_attacks(square, occupied, ORTHOGONAL_RAYS) & not_own, moves)
+
+        for square in squares_of(pinned):
+            self.move_functions[self.squares[square][1]](square // 8, square % 8, moves)
+        for square in squares_of(bitboards[ally + 'K']):
+            self.get_king_moves(square // 8, square % 8, moves)
         return moves
 
+    def add_moves(self, start, targets, moves, pawn_promotion=False):
+        """Appends a move from the start square to every square set in the targets bitboard"""
+        squares = self.squares
+        base = start | PIECE_CODE[squares[start]] << MOVED_SHIFT
+        if pawn_promotion:
+            base |= QUEEN_PROMOTION
+        while targets:
+            lowest = targets & -targets
+            targets ^= lowest
+            end = lowest.bit_length() - 1
+            moves.append(base | end << END_SHIFT | PIECE_CODE[squares[end]] << CAPTURED_SHIFT)
+
+    def pin_mask(self, row, column):
+        """Squares the piece at (row, column) may move to without exposing its king"""
+        for pin in self.pins:
+            if pin[0] == row and pin[1] == column:
+                square = row * 8 + column
+                return RAYS[DIRECTION_INDEX[pin[2], pin[3]]][square] | RAYS[DIRECTION_INDEX[-pin[2], -pin[3]]][square]
+        return FULL_BOARD
+
+    def get_unpinned_pawn_moves(self, pawns, moves, targets=FULL_BOARD):
+        """
+        Gets pushes and captures for a whole set of unpinned pawns with one shift per move kind,
+        keeping only moves that land on targets (or, for en passant, capture a pawn on targets)
+        """
+        empty = self.occupied ^ FULL_BOARD
+        if self.white_to_move:
+            forward = -8
+            enemies = self.occupancy['b']
+            single = (pawns >> 8) & empty
+            double = (single >> 8) & empty & RANK_4
+            captures_left = (pawns >> 9) & COLUMN_SHIFT_MASKS[-1] & enemies
+            captures_right = (pawns >> 7) & COLUMN_SHIFT_MASKS[1] & enemies
+        else:
+            forward = 8
+            enemies = self.occupancy['w']
+            single = (pawns << 8) & empty
+            double = (single << 8) & empty & RANK_5
+            captures_left = (pawns << 7) & COLUMN_SHIFT_MASKS[-1] & enemies
+            captures_right = (pawns << 9) & COLUMN_SHIFT_MASKS[1] & enemies
+        single &= targets
+        double &= targets
+        captures_left &= targets
+        captures_right &= targets
+
+        squares = self.squares
+        pawn = PIECE_CODE['wP' if self.white_to_move else 'bP'] << MOVED_SHIFT
+        back_ranks = RANK_8 | RANK_1  # If piece gets to back rank, it is a pawn promotion
+        for ends, offset in ((single, forward), (double, 2 * forward),
+                             (captures_left, forward - 1), (captures_right, forward + 1)):
+            while ends:
+                lowest = ends & -ends
+                ends ^= lowest
+                end = lowest.bit_length() - 1
+                move = (end - offset) | end << END_SHIFT | pawn | PIECE_CODE[squares[end]] << CAPTURED_SHIFT
+                if lowest & back_ranks:
+                    move |= QUEEN_PROMOTION
+                moves.append(move)
+
+        if self.en_passant_square != NO_SQUARE:
+            landing = 1 << self.en_passant_square
+            captured = landing << 8 if self.white_to_move else landing >> 8
+            if (landing | captured) & targets:
+                for square in squares_of(pawn_attacks(landing, not self.white_to_move) & pawns):
+                    self.get_en_passant_move(square // 8, square % 8, moves)
+
     def get_pawn_moves(self, row, column, moves):
         """Gets all pawn moves for the pawn located at (row, column) and adds moves to move log"""
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == column:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        bit = 1 << (row * 8 + column)
+        allowed = self.pin_mask(row, column)
 
         if self.white_to_move:
             move_amount = -1
-            start_row = 6
-            back_row = 0
+            double_rank = RANK_4
             opponent = 'b'
-            king_row, king_column = self.white_king_location
         else:
             move_amount = 1
-            start_row = 1
-            back_row = 7
+            double_rank = RANK_5
+            opponent = 'w'
+        pawn_promotion = row + move_amount in (0, 7)  # If piece gets to back rank, it is a pawn promotion
+        empty = self.occupied ^ FULL_BOARD
+
+        single = shift(bit, move_amount, 0) & empty  # 1 square move
+        double = shift(single, move_amount, 0) & empty & double_rank  # 2 square advance
+        captures = pawn_attacks(bit, self.white_to_move) & self.occupancy[opponent]
+        self.add_moves(row * 8 + column, (single | captures) & allowed, moves, pawn_promotion)
+        self.add_moves(row * 8 + column, double & allowed, moves)
+
+        if self.en_passant_square != NO_SQUARE:
+            en_passant_row, en_passant_column = SQUARE_COORDINATES[self.en_passant_square]
+            if en_passant_row == row + move_amount and abs(en_passant_column - column) == 1 and \
+                    allowed >> (en_passant_row * 8 + en_passant_column) & 1:
+                self.get_en_passant_move(row, column, moves)
+
+    def get_en_passant_move(self, row, column, moves):
+        """Adds the en passant capture for the pawn at (row, column) unless it would expose the king"""
+        en_passant_row, en_passant_column = SQUARE_COORDINATES[self.en_passant_square]
+        if self.white_to_move:
+            opponent = 'b'
+            king_row, king_column = self.white_king_location
+        else:
             opponent = 'w'
             king_row, king_column = self.black_king_location
-        pawn_promotion = False
-
-        if self.board[row + move_amount][column] == '--':  # 1 square move
-            if not piece_pinned or pin_direction == (move_amount, 0):
-                if row + move_amount == back_row:  # If piece gets to back rank, it is a pawn promotion
-                    pawn_promotion = True
-                moves.append(
-                    Move((row, column), (row + move_amount, column), self.board, pawn_promotion=pawn_promotion))
-                if row == start_row and self.board[row + 2 * move_amount][column] == '--':  # 2 square advance
-                    moves.append(Move((row, column), (row + 2 * move_amount, column), self.board))
-        if column - 1 >= 0:  # Captures left
-            if not piece_pinned or pin_direction == (move_amount, -1):
-                if self.board[row + move_amount][column - 1][0] == opponent:
-                    if row + move_amount == back_row:  # If piece gets to back rank, it is a pawn promotion
-                        pawn_promotion = True
-                    moves.append(Move((row, column), (row + move_amount, column - 1),
-                                      self.board, pawn_promotion=pawn_promotion))
-                if (row + move_amount, column - 1) == self.en_passant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == row:
-                        if king_column < column:  # King is left of pawn
-                            # inside_range between king and pawn; outside_range between pawn and border
-                            inside_range = range(king_column + 1, column - 1)
-                            outside_range = range(column + 1, len(self.board))
-                        else:  # King is right of pawn
-                            inside_range = range(king_column - 1, column, -1)
-                            outside_range = range(column - 2, -1, -1)
-                        for i in inside_range:
-                            if self.board[row][i] != '--':
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[row][i]
-                            if square[0] == opponent and (square[1] == 'R' or square[1] == 'Q'):
-                                attacking_piece = True
-                            elif square != '--':
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(Move((row, column), (row + move_amount, column - 1), self.board, en_passant=True))
-        if column + 1 <= len(self.board) - 1:  # Captures right
-            if not piece_pinned or pin_direction == (move_amount, 1):
-                if self.board[row + move_amount][column + 1][0] == opponent:
-                    if row + move_amount == back_row:  # If piece gets to back rank, it is a pawn promotion
-                        pawn_promotion = True
-                    moves.append(Move((row, column), (row + move_amount, column + 1),
-                                      self.board, pawn_promotion=pawn_promotion))
-                if (row + move_amount, column + 1) == self.en_passant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == row:
-                        if king_column < column:  # King is left of pawn
-                            # inside_range between king and pawn; outside_range between pawn and border
-                            inside_range = range(king_column + 1, column)
-                            outside_range = range(column + 2, len(self.board))
-                        else:  # King is right of pawn
-                            inside_range = range(king_column - 1, column + 1, -1)
-                            outside_range = range(column - 1, -1, -1)
-                        for i in inside_range:
-                            if self.board[row][i] != '--':
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[row][i]
-                            if square[0] == opponent and (square[1] == 'R' or square[1] == 'Q'):
-                                attacking_piece = True
-                            elif square != '--':
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(Move((row, column), (row + move_amount, column + 1), self.board, en_passant=True))
+
+        # Removing both pawns at once can open a line onto the king that no pin detected
+        bit = 1 << (row * 8 + column)
+        captured = 1 << (row * 8 + en_passant_column)
+        landing = 1 << (en_passant_row * 8 + en_passant_column)
+        occupied = (self.occupied ^ bit ^ captured) | landing
+        king = king_row * 8 + king_column
+        orthogonal = self.bitboards[opponent + 'R'] | self.bitboards[opponent + 'Q']
+        diagonal = self.bitboards[opponent + 'B'] | self.bitboards[opponent + 'Q']
+        if not (slider_attacks(king, occupied, ORTHOGONAL_RAYS) & orthogonal or
+                slider_attacks(king, occupied, DIAGONAL_RAYS) & diagonal):
+            moves.append(row * 8 + column | self.en_passant_square << END_SHIFT | EN_PASSANT_FLAG |
+                         PIECE_CODE[self.squares[row * 8 + column]] << MOVED_SHIFT |
+                         PIECE_CODE[opponent + 'P'] << CAPTURED_SHIFT)
 
     def get_rook_moves(self, row, column, moves):
         """Gets all rook moves for the rook located at (row, column) and adds moves to move log"""
-        opponent = 'b' if self.white_to_move else 'w'
-
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == column:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                if self.board[row][column][1] != 'Q':  # Can't remove queen from pin on rook moves (only bishop moves)
-                    self.pins.remove(self.pins[i])
-                break
-
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1)]  # Tuples indicate (row, column) movements possible
-        for d in directions:
-            for i in range(1, len(self.board)):
-                end_row = row + d[0] * i  # Potentially moves up/down to 7 rows
-                end_column = column + d[1] * i  # Potentially moves up/down to 7 columns
-                if 0 <= end_row < len(self.board) and 0 <= end_column < len(self.board):  # Makes sure on the board
-                    if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        end_piece = self.board[end_row][end_column]
-                        if end_piece == '--':  # Valid move to empty space
-                            moves.append(Move((row, column), (end_row, end_column), self.board))
-                        elif end_piece[0] == opponent:  # Valid move to capture
-                            moves.append(Move((row, column), (end_row, end_column), self.board))
-                            break
-                        else:  # Cannot take friendly piece
-                            break
-                else:  # Cannot move off board
-                    break
+        ally = 'w' if self.white_to_move else 'b'
+        targets = slider_attacks(row * 8 + column, self.occupied, ORTHOGONAL_RAYS) & ~self.occupancy[ally]
+        self.add_moves(row * 8 + column, targets & self.pin_mask(row, column), moves)
 
     def get_knight_moves(self, row, column, moves):
         """Gets all knight moves for the knight located at (row, column) and adds moves to move log"""
-        opponent = 'b' if self.white_to_move else 'w'
-
-        piece_pinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == column:
-                piece_pinned = True
-                self.pins.remove(self.pins[i])
-                break
-
-        # Tuples indicate (row, column) movements possible
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-
-        for d in directions:
-            end_row = row + d[0]
-            end_column = column + d[1]
-            if 0 <= end_row < len(self.board) and 0 <= end_column < len(self.board):  # Makes sure on the board
-                if not piece_pinned:
-                    end_piece = self.board[end_row][end_column]
-                    if end_piece[0] == opponent:  # Valid move to capture
-                        moves.append(Move((row, column), (end_row, end_column), self.board))
-                    elif end_piece == '--':  # Valid move to empty space
-                        moves.append(Move((row, column), (end_row, end_column), self.board))
+        if self.pin_mask(row, column) != FULL_BOARD:
+            return  # A pinned knight can never stay on its pin line
+        ally = 'w' if self.white_to_move else 'b'
+        targets = KNIGHT_TARGETS[row * 8 + column] & ~self.occupancy[ally]
+        self.add_moves(row * 8 + column, targets, moves)
 
     def get_bishop_moves(self, row, column, moves):
         """Gets all bishop moves for the bishop located at (row, column) and adds moves to move log"""
-        opponent = 'b' if self.white_to_move else 'w'
-
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == column:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
-
-        directions = [(-1, -1), (-1, 1), (1, 1), (1, -1)]  # Tuples indicate (row, column) movements possible
-        for d in directions:
-            for i in range(1, len(self.board)):
-
-                # See get_rook_moves for explanation; same here but for diagonals
-                end_row = row + d[0] * i
-                end_column = column + d[1] * i
-
-                if 0 <= end_row < len(self.board) and 0 <= end_column < len(self.board):  # Makes sure on the board
-                    if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
-                        end_piece = self.board[end_row][end_column]
-                        if end_piece == '--':  # Valid move to empty space
-                            moves.append(Move((row, column), (end_row, end_column), self.board))
-                        elif end_piece[0] == opponent:  # Valid move to capture
-                            moves.append(Move((row, column), (end_row, end_column), self.board))
-                            break
-                        else:  # Cannot take friendly piece
-                            break
-                else:  # Cannot move off board
-                    break
+        ally = 'w' if self.white_to_move else 'b'
+        targets = slider_attacks(row * 8 + column, self.occupied, DIAGONAL_RAYS) & ~self.occupancy[ally]
+        self.add_moves(row * 8 + column, targets & self.pin_mask(row, column), moves)
 
     def get_queen_moves(self, row, column, moves):
         """Gets all queen moves for the queen located at (row, column) and adds moves to move log"""
@@ -382,29 +739,10 @@ class GameState:
     def get_king_moves(self, row, column, moves):
         """Gets all king moves for the king located at (row, column) and adds moves to move log"""
         ally = 'w' if self.white_to_move else 'b'
-        row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        column_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
-        for i in range(len(self.board)):
-            end_row = row + row_moves[i]
-            end_column = column + column_moves[i]
-            if 0 <= end_row < len(self.board) and 0 <= end_column < len(self.board):  # Makes sure on the board
-                end_piece = self.board[end_row][end_column]
-                if end_piece[0] != ally:  # Empty or enemy piece
-
-                    # Places king on end square and checks for checks
-                    if ally == 'w':
-                        self.white_king_location = (end_row, end_column)
-                    else:
-                        self.black_king_location = (end_row, end_column)
-                    in_check, pins, checks = self.check_for_pins_and_checks()
-                    if not in_check:
-                        moves.append(Move((row, column), (end_row, end_column), self.board))
-
-                    # Places king back on original location
-                    if ally == 'w':
-                        self.white_king_location = (row, column)
-                    else:
-                        self.black_king_location = (row, column)
+        opponent = 'b' if self.white_to_move else 'w'
+        bit = 1 << (row * 8 + column)
+        danger = self.attacked_squares(opponent, self.occupied ^ bit)  # Lifts the king so sliders see through it
+        self.add_moves(row * 8 + column, KING_TARGETS[row * 8 + column] & ~self.occupancy[ally] & ~danger, moves)
         self.get_castle_moves(row, column, moves, ally)
 
     def get_castle_moves(self, row, column, moves, ally):
@@ -414,101 +752,95 @@ class GameState:
         """
         if self.square_under_attack(row, column, ally):
             return  # Can't castle while in check
-        if (self.white_to_move and self.white_castle_king_side) or \
-                (not self.white_to_move and self.black_castle_king_side):
+        if self.castle_rights & (WHITE_KING_SIDE if self.white_to_move else BLACK_KING_SIDE):
             self.get_king_side_castle_moves(row, column, moves, ally)
-        if (self.white_to_move and self.white_castle_queen_side) or \
-                (not self.white_to_move and self.black_castle_queen_side):
+        if self.castle_rights & (WHITE_QUEEN_SIDE if self.white_to_move else BLACK_QUEEN_SIDE):
             self.get_queen_side_castle_moves(row, column, moves, ally)
 
     def get_king_side_castle_moves(self, row, column, moves, ally):
-        if self.board[row][column + 1] == '--' and self.board[row][column + 2] == '--' and \
+        square = row * 8 + column
+        if not self.occupied & (0b11 << (square + 1)) and \
                 not self.square_under_attack(row, column + 1, ally) and not self.square_under_attack(row, column + 2,
                                                                                                      ally):
-            moves.append(Move((row, column), (row, column + 2), self.board, castle=True))
+            moves.append(square | (square + 2) << END_SHIFT | CASTLE_FLAG | PIECE_CODE[ally + 'K'] << MOVED_SHIFT)
 
     def get_queen_side_castle_moves(self, row, column, moves, ally):
-        if self.board[row][column - 1] == '--' and self.board[row][column - 2] == '--' and \
-                self.board[row][column - 3] == '--' and not self.square_under_attack(row, column - 1, ally) and \
+        square = row * 8 + column
+        if not self.occupied & (0b111 << (square - 3)) and not self.square_under_attack(row, column - 1, ally) and \
                 not self.square_under_attack(row, column - 2, ally):
-            moves.append(Move((row, column), (row, column - 2), self.board, castle=True))
-
-    def update_castle_rights(self, move):
-        """Updates castle rights given the move"""
-
-        # If king or rook moved
-        if move.piece_moved == 'wK':
-            self.white_castle_queen_side = False
-            self.white_castle_king_side = False
-        elif move.piece_moved == 'bK':
-            self.black_castle_queen_side = False
-            self.black_castle_king_side = False
-        elif move.piece_moved == 'wR':
-            if move.start_row == 7:
-                if move.start_column == 7:
-                    self.white_castle_king_side = False
-                elif move.start_column == 0:
-                    self.white_castle_queen_side = False
-        elif move.piece_moved == 'bR':
-            if move.start_row == 0:
-                if move.start_column == 7:
-                    self.black_castle_king_side = False
-                elif move.start_column == 0:
-                    self.black_castle_queen_side = False
-
-        # If rook is captured
-        if move.piece_captured == 'wR':
-            if move.end_row == 7:
-                if move.end_column == 0:
-                    self.white_castle_queen_side = False
-                elif move.end_column == 7:
-                    self.white_castle_king_side = False
-        elif move.piece_captured == 'bR':
-            if move.end_row == 0:
-                if move.end_column == 0:
-                    self.black_castle_queen_side = False
-                elif move.end_column == 7:
-                    self.black_castle_king_side = False
+            moves.append(square | (square - 2) << END_SHIFT | CASTLE_FLAG | PIECE_CODE[ally + 'K'] << MOVED_SHIFT)
+
+    def attackers_of(self, square, color, occupied):
+        """Bitboard of every piece of color attacking square, given the occupancy to slide through"""
+        bitboards = self.bitboards
+        return (KNIGHT_TARGETS[square] & bitboards[color + 'N']) | \
+            (KING_TARGETS[square] & bitboards[color + 'K']) | \
+            (pawn_attacks(1 << square, color == 'b') & bitboards[color + 'P']) | \
+            (slider_attacks(square, occupied, DIAGONAL_RAYS) & (bitboards[color + 'B'] | bitboards[color + 'Q'])) | \
+            (slider_attacks(square, occupied, ORTHOGONAL_RAYS) & (bitboards[color + 'R'] | bitboards[color + 'Q']))
+
+    def attacked_squares(self, color, occupied):
+        """Bitboard of every square attacked by color, with each piece type handled set-wise"""
+        bitboards = self.bitboards
+        queens = bitboards[color + 'Q']
+        return knight_attacks(bitboards[color + 'N']) | king_attacks(bitboards[color + 'K']) | \
+            pawn_attacks(bitboards[color + 'P'], color == 'w') | \
+            sliding_attacks(bitboards[color + 'B'] | queens, DIAGONAL_SHIFTS, occupied) | \
+            sliding_attacks(bitboards[color + 'R'] | queens, ORTHOGONAL_SHIFTS, occupied)
 
     def square_under_attack(self, row, column, ally):
         """Checks outward from a square to see if it is being attacked, thus invalidating castling"""
         opponent = 'b' if self.white_to_move else 'w'
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            d = directions[j]
-            for i in range(1, len(self.board)):
-                end_row = row + d[0] * i
-                end_column = column + d[1] * i
-                if 0 <= end_row < len(self.board) and 0 <= end_column < len(self.board):
-                    end_piece = self.board[end_row][end_column]
-                    if end_piece[0] == ally:  # no attack from that direction
-                        break
-                    elif end_piece[0] == opponent:
-                        piece_type = end_piece[1]
-                        if (0 <= j <= 3 and piece_type == 'R') or (4 <= j <= 7 and piece_type == 'B') or \
-                                (i == 1 and piece_type == 'P' and ((opponent == 'w' and 6 <= j <= 7)
-                                                                   or (opponent == 'b' and 4 <= j <= 5))) or \
-                                (piece_type == 'Q') or (i == 1 and piece_type == 'K'):
-                            return True
-                        else:  # Enemy piece but not applying check
-                            break
-                else:  # Off board
+        return self.attackers_of(row * 8 + column, opponent, self.occupied) != 0
+
+    def static_exchange(self, move, values):
+        """
+        Static exchange evaluation: material the side making move wins (negative if it loses)
+        once both sides have recaptured on the target square with their least valuable attackers
+        for as long as it pays. Uses the same attack lookup as square_under_attack, removing each
+        capturer from the occupancy so sliders behind it join in; pins are ignored.
+        values maps piece type ('P', 'N', ...) to its worth.
+        """
+        start = move & SQUARE_MASK
+        square = move >> END_SHIFT & SQUARE_MASK
+        piece_moved = PIECE_CODES[move >> MOVED_SHIFT & PIECE_MASK]
+        captured = move >> CAPTURED_SHIFT & PIECE_MASK
+        occupied = self.occupied ^ (1 << start)
+        if move & EN_PASSANT_FLAG:
+            occupied ^= 1 << ((start & ~7) | (square & 7))
+        gains = [values[PIECE_CODES[captured][1]] if captured else 0]
+        piece_value = values[piece_moved[1]]  # Worth of the piece now standing on the square
+        if move >> PROMOTION_SHIFT & PIECE_MASK:
+            gains[0] += values['Q'] - values['P']
+            piece_value = values['Q']
+
+        bitboards = self.bitboards
+        color = 'b' if piece_moved[0] == 'w' else 'w'
+        while True:
+            attackers = self.attackers_of(square, color, occupied) & occupied
+            if not attackers:
+                break
+            for piece_type in PIECE_TYPES:  # Least valuable attacker first
+                candidates = attackers & bitboards[color + piece_type]
+                if candidates:
                     break
-        knight_moves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-        for move in knight_moves:
-            end_row = row + move[0]
-            end_column = column + move[1]
-            if 0 <= end_row < len(self.board) and 0 <= end_column < len(self.board):
-                end_piece = self.board[end_row][end_column]
-                if end_piece[0] == opponent and end_piece[1] == 'N':
-                    return True
-        return False
+            color = 'b' if color == 'w' else 'w'
+            if piece_type == 'K' and self.attackers_of(square, color, occupied) & occupied:
+                break  # The king cannot capture onto a defended square
+            gains.append(piece_value - gains[-1])
+            piece_value = values[piece_type]
+            occupied ^= candidates & -candidates
+
+        # Either side may stop recapturing once continuing would lose material
+        while len(gains) > 1:
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+        return gains[0]
 
     def check_for_pins_and_checks(self):
         """Returns if the player is in check, a list of pins, and a list of checks"""
         pins = []
         checks = []
-        in_check = False
 
         if self.white_to_move:
             opponent = 'b'
@@ -518,67 +850,42 @@ class GameState:
             opponent = 'w'
             ally = 'b'
             start_row, start_column = self.black_king_location[0], self.black_king_location[1]
+        king_square = start_row * 8 + start_column
+        king = 1 << king_square
+        bitboards = self.bitboards
+
+        orthogonal = bitboards[opponent + 'R'] | bitboards[opponent + 'Q']
+        diagonal = bitboards[opponent + 'B'] | bitboards[opponent + 'Q']
+        for j, (row_step, column_step) in enumerate(DIRECTIONS):
+            sliders = RAYS[j][king_square] & (orthogonal if j < 4 else diagonal)
+            if not sliders:
+                continue
+            # The slider nearest the king along the ray, and whatever stands between the two
+            if row_step * 8 + column_step > 0:
+                square = (sliders & -sliders).bit_length() - 1
+            else:
+                square = sliders.bit_length() - 1
+            blockers = BETWEEN_SQUARES[king_square][square] & self.occupied
+            if not blockers:  # no piece blocking, so check
+                checks.append((square // 8, square % 8, row_step, column_step))
+            elif blockers & (blockers - 1) == 0 and blockers & self.occupancy[ally]:  # One ally piece blocking, so pin
+                square = blockers.bit_length() - 1
+                pins.append((square // 8, square % 8, row_step, column_step))
 
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            d = directions[j]
-            possible_pin = ()  # Resets possible pins
-            for i in range(1, len(self.board)):
-                end_row = start_row + d[0] * i
-                end_column = start_column + d[1] * i
-                if 0 <= end_row < len(self.board) and 0 <= end_column < len(self.board):
-                    end_piece = self.board[end_row][end_column]
-                    if end_piece[0] == ally and end_piece[1] != 'K':
-                        if possible_pin == ():  # 1st ally piece can be pinned
-                            possible_pin = (end_row, end_column, d[0], d[1])
-                        else:  # 2nd ally piece, so no pin or check possible
-                            break
-                    elif end_piece[0] == opponent:
-                        piece_type = end_piece[1]
-                        if (0 <= j <= 3 and piece_type == 'R') or (4 <= j <= 7 and piece_type == 'B') or \
-                                (i == 1 and piece_type == 'P' and ((opponent == 'w' and 6 <= j <= 7)
-                                                                   or (opponent == 'b' and 4 <= j <= 5))) or \
-                                (piece_type == 'Q') or (i == 1 and piece_type == 'K'):
-                            if possible_pin == ():  # no piece blocking, so check
-                                in_check = True
-                                checks.append((end_row, end_column, d[0], d[1]))
-                                break
-                            else:  # Piece blocking, so pin
-                                pins.append(possible_pin)
-                                break
-                        else:  # Enemy piece but not applying check
-                            break
-                else:  # Off board
-                    break
-
-        knight_moves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-        for move in knight_moves:
-            end_row = start_row + move[0]
-            end_column = start_column + move[1]
-            if 0 <= end_row < len(self.board) and 0 <= end_column < len(self.board):
-                end_piece = self.board[end_row][end_column]
-                if end_piece[0] == opponent and end_piece[1] == 'N':
-                    in_check = True
-                    checks.append((end_row, end_column, move[0], move[1]))
-
-        return in_check, pins, checks
-
-
-class CastleRights:
-    """Data storage of current states of castling rights"""
+        for square in squares_of(pawn_attacks(king, ally == 'w') & bitboards[opponent + 'P']):
+            checks.append((square // 8, square % 8, square // 8 - start_row, square % 8 - start_column))
+        for square in squares_of(KNIGHT_TARGETS[king_square] & bitboards[opponent + 'N']):
+            checks.append((square // 8, square % 8, square // 8 - start_row, square % 8 - start_column))
 
-    def __init__(self, white_king_side, black_king_side, white_queen_side, black_queen_side):
-        self.white_king_side = white_king_side
-        self.black_king_side = black_king_side
-        self.white_queen_side = white_queen_side
-        self.black_queen_side = black_queen_side
+        return len(checks) > 0, pins, checks
 
 
 class Move:
     """
-    Class responsible for storing information about particular moves,
-    including starting and ending positions, which pieces were moved and captured,
-    and special moves such as en passant, pawn promotion, and castling.
+    Readable view of a move, including starting and ending positions, which pieces were moved
+    and captured, and special moves such as en passant, pawn promotion, and castling.
+    The engine itself works on packed move ints; code holds this move's int, and
+    Move.from_code builds the view back from one.
     """
     ranks_to_rows = {'1': 7, '2': 6, '3': 5, '4': 4,
                      '5': 3, '6': 2, '7': 1, '8': 0}
@@ -602,6 +909,26 @@ class Move:
         self.is_castle_move = castle
         self.is_capture = self.piece_captured != '--'
         self.move_id = self.start_row * 1000 + self.start_column * 100 + self.end_row * 10 + self.end_column
+        self.code = (self.start_row * 8 + self.start_column) | (self.end_row * 8 + self.end_column) << END_SHIFT | \
+            (QUEEN_PROMOTION if pawn_promotion else 0) | (EN_PASSANT_FLAG if en_passant else 0) | \
+            (CASTLE_FLAG if castle else 0) | PIECE_CODE[self.piece_moved] << MOVED_SHIFT | \
+            PIECE_CODE[self.piece_captured] << CAPTURED_SHIFT
+
+    @classmethod
+    def from_code(cls, code):
+        """Builds the view of a packed move int, such as one from get_valid_moves"""
+        move = cls.__new__(cls)
+        move.code = code
+        move.start_row, move.start_column = SQUARE_COORDINATES[code & SQUARE_MASK]
+        move.end_row, move.end_column = SQUARE_COORDINATES[code >> END_SHIFT & SQUARE_MASK]
+        move.piece_moved = PIECE_CODES[code >> MOVED_SHIFT & PIECE_MASK]
+        move.piece_captured = PIECE_CODES[code >> CAPTURED_SHIFT & PIECE_MASK]
+        move.is_pawn_promotion = code >> PROMOTION_SHIFT & PIECE_MASK != 0
+        move.is_en_passant_move = code & EN_PASSANT_FLAG != 0
+        move.is_castle_move = code & CASTLE_FLAG != 0
+        move.is_capture = move.piece_captured != '--'
+        move.move_id = move.start_row * 1000 + move.start_column * 100 + move.end_row * 10 + move.end_column
+        return move
 
     def __eq__(self, other):
         """Overrides the equals method because a Class is used"""
@@ -644,3 +971,571 @@ class Move:
             move_string += 'x'
 
         return f'{move_string}{end_square}'
+
+
+class OpeningBook:
+    """
+    Read-only Polyglot opening book (.bin). Entries are 16 bytes, sorted by Zobrist key:
+    key, move, weight and learn data, all big-endian. The file is memory-mapped and
+    binary-searched in place, so opening even a large book costs nothing up front and
+    a lookup touches only a handful of entries.
+    """
+    ENTRY_BYTES = 16
+    ENTRY = struct.Struct('>QHHI')
+
+    def __init__(self, path):
+        with open(path, 'rb') as book_file:
+            try:
+                self.data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, OSError, ValueError):  # No mmap in this Python build, or an empty file
+                self.data = book_file.read()
+        self.size = len(self.data) // self.ENTRY_BYTES
+
+    def close(self):
+        if mmap is not None and isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def entries(self, key):
+        """Returns [(Polyglot move, weight)] stored for key, in book order"""
+        data = self.data
+        key_bytes = key.to_bytes(8, 'big')  # Big-endian bytes compare in the same order as the keys
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * self.ENTRY_BYTES
+            if data[offset:offset + 8] < key_bytes:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        offset = low * self.ENTRY_BYTES
+        while offset < self.size * self.ENTRY_BYTES and data[offset:offset + 8] == key_bytes:
+            _, move, weight, _ = self.ENTRY.unpack_from(data, offset)
+            found.append((move, weight))
+            offset += self.ENTRY_BYTES
+        return found
+
+    def moves(self, gs):
+        """Returns [(move int, weight)] for the book moves that are legal in gs"""
+        entries = self.entries(gs.zobrist_key)
+        if not entries:
+            return []
+        legal = {move & MOVE_KEY_MASK: move for move in gs.get_valid_moves()}
+        moves = []
+        for book_move, weight in entries:
+            # Polyglot packs to file, to rank, from file, from rank and promotion in 3 bits each, ranks counted from 1
+            start = (7 - (book_move >> 9 & 7)) * 8 + (book_move >> 6 & 7)
+            end = (7 - (book_move >> 3 & 7)) * 8 + (book_move & 7)
+            key = start | end << END_SHIFT | (book_move >> 12 & 7) << PROMOTION_SHIFT  # Same piece order as PIECE_TYPES
+            if key not in legal and gs.squares[start][1] == 'K' and gs.squares[end] == gs.squares[start][0] + 'R':
+                key = start | (start - 2 if end < start else start + 2) << END_SHIFT  # Castling is written as king takes rook
+            if key in legal and weight:
+                moves.append((legal[key], weight))
+        return moves
+
+    def pick_move(self, gs, rng=random):
+        """A book move for gs chosen with probability proportional to its weight, or None when out of book"""
+        moves = self.moves(gs)
+        if not moves:
+            return None
+        pick = rng.randrange(sum(weight for _, weight in moves))
+        for move, weight in moves:
+            pick -= weight
+            if pick < 0:
+                return move
+
+
+# ==========================================
+# ENDGAME TABLES
+# ==========================================
+# Distance-to-mate tables for king and queen, rook or pawn against a lone king, written by endgames.py.
+# Positions are indexed as if the stronger side were White, using the board's symmetries: pawnless
+# positions are turned so the strong king lies in the a8-d8-d5 triangle, pawn positions mirrored so
+# the pawn stands on files a-d. Each byte is the number of plies to mate plus one, or 0 for a draw.
+
+ENDGAME_PIECE_TYPES = ('Q', 'R', 'P')
+
+
+def square_symmetries():
+    """For each strong king square, the square mapping (flips, then a diagonal turn) that brings it into the triangle"""
+    symmetries = []
+    for square in range(64):
+        row, column = SQUARE_COORDINATES[square]
+        flip_rows, flip_columns = row > 3, column > 3
+        row, column = (7 - row if flip_rows else row), (7 - column if flip_columns else column)
+        turn = row > column
+        mapping = []
+        for target in range(64):
+            target_row, target_column = SQUARE_COORDINATES[target]
+            target_row = 7 - target_row if flip_rows else target_row
+            target_column = 7 - target_column if flip_columns else target_column
+            if turn:
+                target_row, target_column = target_column, target_row
+            mapping.append(target_row * 8 + target_column)
+        symmetries.append(tuple(mapping))
+    return tuple(symmetries)
+
+
+KING_SYMMETRIES = square_symmetries()
+KING_TRIANGLE = tuple(row * 8 + column for row in range(4) for column in range(row, 4))  # 10 squares a8..d8, b7..d7, c6, d6, d5
+KING_TRIANGLE_INDEX = {square: index for index, square in enumerate(KING_TRIANGLE)}
+PAWN_SQUARES = tuple(row * 8 + column for row in range(1, 7) for column in range(4))  # Ranks 7 to 2 on files a-d
+PAWN_SQUARE_INDEX = {square: index for index, square in enumerate(PAWN_SQUARES)}
+ENDGAME_TABLE_SIZES = {'Q': len(KING_TRIANGLE) * 64 * 64 * 2, 'R': len(KING_TRIANGLE) * 64 * 64 * 2,
+                       'P': len(PAWN_SQUARES) * 64 * 64 * 2}
+
+
+def endgame_index(gs):
+    """
+    Returns (piece type, table index, strong side to move) for a king and queen, rook or pawn
+    against a lone king, or None for any other material
+    """
+    kings = gs.bitboards['wK'] | gs.bitboards['bK']
+    others = gs.occupied & ~kings
+    if not others or others & (others - 1):
+        return None
+    square = others.bit_length() - 1
+    color, piece_type = gs.squares[square]
+    if piece_type not in ENDGAME_PIECE_TYPES:
+        return None
+    weak = 'b' if color == 'w' else 'w'
+    flip = 56 if color == 'b' else 0  # Mirror the ranks so the strong side plays up the board like White
+    strong_king = (gs.bitboards[color + 'K'].bit_length() - 1) ^ flip
+    weak_king = (gs.bitboards[weak + 'K'].bit_length() - 1) ^ flip
+    square ^= flip
+    if piece_type == 'P':  # Pawn square, then strong king square
+        if square & 7 > 3:
+            strong_king, weak_king, square = strong_king ^ 7, weak_king ^ 7, square ^ 7
+        first, second = PAWN_SQUARE_INDEX[square], strong_king
+    else:  # Strong king square, then piece square
+        mapping = KING_SYMMETRIES[strong_king]
+        strong_king, weak_king, square = mapping[strong_king], mapping[weak_king], mapping[square]
+        first, second = KING_TRIANGLE_INDEX[strong_king], square
+    strong_to_move = gs.white_to_move == (color == 'w')
+    return piece_type, ((first * 64 + second) * 64 + weak_king) * 2 + strong_to_move, strong_to_move
+
+
+class EndgameTables:
+    """
+    The KQK, KRK and KPK distance-to-mate tables in directory, each read the first time
+    a position with its material is probed. A missing file just leaves that ending to the search.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}  # Piece type -> table bytes, or None if its file is missing
+
+    def table(self, piece_type):
+        if piece_type not in self.tables:
+            path = os.path.join(self.directory, f'k{piece_type.lower()}k.bin')
+            try:
+                with open(path, 'rb') as table_file:
+                    table = table_file.read()
+                self.tables[piece_type] = table if len(table) == ENDGAME_TABLE_SIZES[piece_type] else None
+            except OSError:
+                self.tables[piece_type] = None
+        return self.tables[piece_type]
+
+    def probe(self, gs):
+        """
+        Plies to mate from the side to move's view: positive if it mates, negative if it gets mated,
+        0 for a draw. None when no table covers gs, or the side to move is already checkmated.
+        """
+        if not gs.occupied & ~(gs.bitboards['wK'] | gs.bitboards['bK']):
+            return 0  # Bare kings
+        found = endgame_index(gs)
+        if found is None:
+            return None
+        piece_type, index, strong_to_move = found
+        table = self.table(piece_type)
+        if table is None:
+            return None
+        value = table[index]
+        if value == 0:
+            return 0
+        if strong_to_move:
+            return value - 1
+        return -(value - 1) or None
+
+
+# ==========================================
+# ZOBRIST HASHING
+# ==========================================
+# The standard Polyglot random numbers, so GameState.zobrist_key matches the keys used by Polyglot opening books.
+# Layout: 768 piece-square keys, 4 castling keys, 8 en passant file keys and 1 white-to-move key.
+
+POLYGLOT_RANDOM_64 = (
+    0x9D39247E33776D41, 0x2AF7398005AAA5C7, 0x44DB015024623547, 0x9C15F73E62A76AE2,
+    0x75834465489C0C89, 0x3290AC3A203001BF, 0x0FBBAD1F61042279, 0xE83A908FF2FB60CA,
+    0x0D7E765D58755C10, 0x1A083822CEAFE02D, 0x9605D5F0E25EC3B0, 0xD021FF5CD13A2ED5,
+    0x40BDF15D4A672E32, 0x011355146FD56395, 0x5DB4832046F3D9E5, 0x239F8B2D7FF719CC,
+    0x05D1A1AE85B49AA1, 0x679F848F6E8FC971, 0x7449BBFF801FED0B, 0x7D11CDB1C3B7ADF0,
+    0x82C7709E781EB7CC, 0xF3218F1C9510786C, 0x331478F3AF51BBE6, 0x4BB38DE5E7219443,
+    0xAA649C6EBCFD50FC, 0x8DBD98A352AFD40B, 0x87D2074B81D79217, 0x19F3C751D3E92AE1,
+    0xB4AB30F062B19ABF, 0x7B0500AC42047AC4, 0xC9452CA81A09D85D, 0x24AA6C514DA27500,
+    0x4C9F34427501B447, 0x14A68FD73C910841, 0xA71B9B83461CBD93, 0x03488B95B0F1850F,
+    0x637B2B34FF93C040, 0x09D1BC9A3DD90A94, 0x3575668334A1DD3B, 0x735E2B97A4C45A23,
+    0x18727070F1BD400B, 0x1FCBACD259BF02E7, 0xD310A7C2CE9B6555, 0xBF983FE0FE5D8244,
+    0x9F74D14F7454A824, 0x51EBDC4AB9BA3035, 0x5C82C505DB9AB0FA, 0xFCF7FE8A3430B241,
+    0x3253A729B9BA3DDE, 0x8C74C368081B3075, 0xB9BC6C87167C33E7, 0x7EF48F2B83024E20,
+    0x11D505D4C351BD7F, 0x6568FCA92C76A243, 0x4DE0B0F40F32A7B8, 0x96D693460CC37E5D,
+    0x42E240CB63689F2F, 0x6D2BDCDAE2919661, 0x42880B0236E4D951, 0x5F0F4A5898171BB6,
+    0x39F890F579F92F88, 0x93C5B5F47356388B, 0x63DC359D8D231B78, 0xEC16CA8AEA98AD76,
+    0x5355F900C2A82DC7, 0x07FB9F855A997142, 0x5093417AA8A7ED5E, 0x7BCBC38DA25A7F3C,
+    0x19FC8A768CF4B6D4, 0x637A7780DECFC0D9, 0x8249A47AEE0E41F7, 0x79AD695501E7D1E8,
+    0x14ACBAF4777D5776, 0xF145B6BECCDEA195, 0xDABF2AC8201752FC, 0x24C3C94DF9C8D3F6,
+    0xBB6E2924F03912EA, 0x0CE26C0B95C980D9, 0xA49CD132BFBF7CC4, 0xE99D662AF4243939,
+    0x27E6AD7891165C3F, 0x8535F040B9744FF1, 0x54B3F4FA5F40D873, 0x72B12C32127FED2B,
+    0xEE954D3C7B411F47, 0x9A85AC909A24EAA1, 0x70AC4CD9F04F21F5, 0xF9B89D3E99A075C2,
+    0x87B3E2B2B5C907B1, 0xA366E5B8C54F48B8, 0xAE4A9346CC3F7CF2, 0x1920C04D47267BBD,
+    0x87BF02C6B49E2AE9, 0x092237AC237F3859, 0xFF07F64EF8ED14D0, 0x8DE8DCA9F03CC54E,
+    0x9C1633264DB49C89, 0xB3F22C3D0B0B38ED, 0x390E5FB44D01144B, 0x5BFEA5B4712768E9,
+    0x1E1032911FA78984, 0x9A74ACB964E78CB3, 0x4F80F7A035DAFB04, 0x6304D09A0B3738C4,
+    0x2171E64683023A08, 0x5B9B63EB9CEFF80C, 0x506AACF489889342, 0x1881AFC9A3A701D6,
+    0x6503080440750644, 0xDFD395339CDBF4A7, 0xEF927DBCF00C20F2, 0x7B32F7D1E03680EC,
+    0xB9FD7620E7316243, 0x05A7E8A57DB91B77, 0xB5889C6E15630A75, 0x4A750A09CE9573F7,
+    0xCF464CEC899A2F8A, 0xF538639CE705B824, 0x3C79A0FF5580EF7F, 0xEDE6C87F8477609D,
+    0x799E81F05BC93F31, 0x86536B8CF3428A8C, 0x97D7374C60087B73, 0xA246637CFF328532,
+    0x043FCAE60CC0EBA0, 0x920E449535DD359E, 0x70EB093B15B290CC, 0x73A1921916591CBD,
+    0x56436C9FE1A1AA8D, 0xEFAC4B70633B8F81, 0xBB215798D45DF7AF, 0x45F20042F24F1768,
+    0x930F80F4E8EB7462, 0xFF6712FFCFD75EA1, 0xAE623FD67468AA70, 0xDD2C5BC84BC8D8FC,
+    0x7EED120D54CF2DD9, 0x22FE545401165F1C, 0xC91800E98FB99929, 0x808BD68E6AC10365,
+    0xDEC468145B7605F6, 0x1BEDE3A3AEF53302, 0x43539603D6C55602, 0xAA969B5C691CCB7A,
+    0xA87832D392EFEE56, 0x65942C7B3C7E11AE, 0xDED2D633CAD004F6, 0x21F08570F420E565,
+    0xB415938D7DA94E3C, 0x91B859E59ECB6350, 0x10CFF333E0ED804A, 0x28AED140BE0BB7DD,
+    0xC5CC1D89724FA456, 0x5648F680F11A2741, 0x2D255069F0B7DAB3, 0x9BC5A38EF729ABD4,
+    0xEF2F054308F6A2BC, 0xAF2042F5CC5C2858, 0x480412BAB7F5BE2A, 0xAEF3AF4A563DFE43,
+    0x19AFE59AE451497F, 0x52593803DFF1E840, 0xF4F076E65F2CE6F0, 0x11379625747D5AF3,
+    0xBCE5D2248682C115, 0x9DA4243DE836994F, 0x066F70B33FE09017, 0x4DC4DE189B671A1C,
+    0x51039AB7712457C3, 0xC07A3F80C31FB4B4, 0xB46EE9C5E64A6E7C, 0xB3819A42ABE61C87,
+    0x21A007933A522A20, 0x2DF16F761598AA4F, 0x763C4A1371B368FD, 0xF793C46702E086A0,
+    0xD7288E012AEB8D31, 0xDE336A2A4BC1C44B, 0x0BF692B38D079F23, 0x2C604A7A177326B3,
+    0x4850E73E03EB6064, 0xCFC447F1E53C8E1B, 0xB05CA3F564268D99, 0x9AE182C8BC9474E8,
+    0xA4FC4BD4FC5558CA, 0xE755178D58FC4E76, 0x69B97DB1A4C03DFE, 0xF9B5B7C4ACC67C96,
+    0xFC6A82D64B8655FB, 0x9C684CB6C4D24417, 0x8EC97D2917456ED0, 0x6703DF9D2924E97E,
+    0xC547F57E42A7444E, 0x78E37644E7CAD29E, 0xFE9A44E9362F05FA, 0x08BD35CC38336615,
+    0x9315E5EB3A129ACE, 0x94061B871E04DF75, 0xDF1D9F9D784BA010, 0x3BBA57B68871B59D,
+    0xD2B7ADEEDED1F73F, 0xF7A255D83BC373F8, 0xD7F4F2448C0CEB81, 0xD95BE88CD210FFA7,
+    0x336F52F8FF4728E7, 0xA74049DAC312AC71, 0xA2F61BB6E437FDB5, 0x4F2A5CB07F6A35B3,
+    0x87D380BDA5BF7859, 0x16B9F7E06C453A21, 0x7BA2484C8A0FD54E, 0xF3A678CAD9A2E38C,
+    0x39B0BF7DDE437BA2, 0xFCAF55C1BF8A4424, 0x18FCF680573FA594, 0x4C0563B89F495AC3,
+    0x40E087931A00930D, 0x8CFFA9412EB642C1, 0x68CA39053261169F, 0x7A1EE967D27579E2,
+    0x9D1D60E5076F5B6F, 0x3810E399B6F65BA2, 0x32095B6D4AB5F9B1, 0x35CAB62109DD038A,
+    0xA90B24499FCFAFB1, 0x77A225A07CC2C6BD, 0x513E5E634C70E331, 0x4361C0CA3F692F12,
+    0xD941ACA44B20A45B, 0x528F7C8602C5807B, 0x52AB92BEB9613989, 0x9D1DFA2EFC557F73,
+    0x722FF175F572C348, 0x1D1260A51107FE97, 0x7A249A57EC0C9BA2, 0x04208FE9E8F7F2D6,
+    0x5A110C6058B920A0, 0x0CD9A497658A5698, 0x56FD23C8F9715A4C, 0x284C847B9D887AAE,
+    0x04FEABFBBDB619CB, 0x742E1E651C60BA83, 0x9A9632E65904AD3C, 0x881B82A13B51B9E2,
+    0x506E6744CD974924, 0xB0183DB56FFC6A79, 0x0ED9B915C66ED37E, 0x5E11E86D5873D484,
+    0xF678647E3519AC6E, 0x1B85D488D0F20CC5, 0xDAB9FE6525D89021, 0x0D151D86ADB73615,
+    0xA865A54EDCC0F019, 0x93C42566AEF98FFB, 0x99E7AFEABE000731, 0x48CBFF086DDF285A,
+    0x7F9B6AF1EBF78BAF, 0x58627E1A149BBA21, 0x2CD16E2ABD791E33, 0xD363EFF5F0977996,
+    0x0CE2A38C344A6EED, 0x1A804AADB9CFA741, 0x907F30421D78C5DE, 0x501F65EDB3034D07,
+    0x37624AE5A48FA6E9, 0x957BAF61700CFF4E, 0x3A6C27934E31188A, 0xD49503536ABCA345,
+    0x088E049589C432E0, 0xF943AEE7FEBF21B8, 0x6C3B8E3E336139D3, 0x364F6FFA464EE52E,
+    0xD60F6DCEDC314222, 0x56963B0DCA418FC0, 0x16F50EDF91E513AF, 0xEF1955914B609F93,
+    0x565601C0364E3228, 0xECB53939887E8175, 0xBAC7A9A18531294B, 0xB344C470397BBA52,
+    0x65D34954DAF3CEBD, 0xB4B81B3FA97511E2, 0xB422061193D6F6A7, 0x071582401C38434D,
+    0x7A13F18BBEDC4FF5, 0xBC4097B116C524D2, 0x59B97885E2F2EA28, 0x99170A5DC3115544,
+    0x6F423357E7C6A9F9, 0x325928EE6E6F8794, 0xD0E4366228B03343, 0x565C31F7DE89EA27,
+    0x30F5611484119414, 0xD873DB391292ED4F, 0x7BD94E1D8E17DEBC, 0xC7D9F16864A76E94,
+    0x947AE053EE56E63C, 0xC8C93882F9475F5F, 0x3A9BF55BA91F81CA, 0xD9A11FBB3D9808E4,
+    0x0FD22063EDC29FCA, 0xB3F256D8ACA0B0B9, 0xB03031A8B4516E84, 0x35DD37D5871448AF,
+    0xE9F6082B05542E4E, 0xEBFAFA33D7254B59, 0x9255ABB50D532280, 0xB9AB4CE57F2D34F3,
+    0x693501D628297551, 0xC62C58F97DD949BF, 0xCD454F8F19C5126A, 0xBBE83F4ECC2BDECB,
+    0xDC842B7E2819E230, 0xBA89142E007503B8, 0xA3BC941D0A5061CB, 0xE9F6760E32CD8021,
+    0x09C7E552BC76492F, 0x852F54934DA55CC9, 0x8107FCCF064FCF56, 0x098954D51FFF6580,
+    0x23B70EDB1955C4BF, 0xC330DE426430F69D, 0x4715ED43E8A45C0A, 0xA8D7E4DAB780A08D,
+    0x0572B974F03CE0BB, 0xB57D2E985E1419C7, 0xE8D9ECBE2CF3D73F, 0x2FE4B17170E59750,
+    0x11317BA87905E790, 0x7FBF21EC8A1F45EC, 0x1725CABFCB045B00, 0x964E915CD5E2B207,
+    0x3E2B8BCBF016D66D, 0xBE7444E39328A0AC, 0xF85B2B4FBCDE44B7, 0x49353FEA39BA63B1,
+    0x1DD01AAFCD53486A, 0x1FCA8A92FD719F85, 0xFC7C95D827357AFA, 0x18A6A990C8B35EBD,
+    0xCCCB7005C6B9C28D, 0x3BDBB92C43B17F26, 0xAA70B5B4F89695A2, 0xE94C39A54A98307F,
+    0xB7A0B174CFF6F36E, 0xD4DBA84729AF48AD, 0x2E18BC1AD9704A68, 0x2DE0966DAF2F8B1C,
+    0xB9C11D5B1E43A07E, 0x64972D68DEE33360, 0x94628D38D0C20584, 0xDBC0D2B6AB90A559,
+    0xD2733C4335C6A72F, 0x7E75D99D94A70F4D, 0x6CED1983376FA72B, 0x97FCAACBF030BC24,
+    0x7B77497B32503B12, 0x8547EDDFB81CCB94, 0x79999CDFF70902CB, 0xCFFE1939438E9B24,
+    0x829626E3892D95D7, 0x92FAE24291F2B3F1, 0x63E22C147B9C3403, 0xC678B6D860284A1C,
+    0x5873888850659AE7, 0x0981DCD296A8736D, 0x9F65789A6509A440, 0x9FF38FED72E9052F,
+    0xE479EE5B9930578C, 0xE7F28ECD2D49EECD, 0x56C074A581EA17FE, 0x5544F7D774B14AEF,
+    0x7B3F0195FC6F290F, 0x12153635B2C0CF57, 0x7F5126DBBA5E0CA7, 0x7A76956C3EAFB413,
+    0x3D5774A11D31AB39, 0x8A1B083821F40CB4, 0x7B4A38E32537DF62, 0x950113646D1D6E03,
+    0x4DA8979A0041E8A9, 0x3BC36E078F7515D7, 0x5D0A12F27AD310D1, 0x7F9D1A2E1EBE1327,
+    0xDA3A361B1C5157B1, 0xDCDD7D20903D0C25, 0x36833336D068F707, 0xCE68341F79893389,
+    0xAB9090168DD05F34, 0x43954B3252DC25E5, 0xB438C2B67F98E5E9, 0x10DCD78E3851A492,
+    0xDBC27AB5447822BF, 0x9B3CDB65F82CA382, 0xB67B7896167B4C84, 0xBFCED1B0048EAC50,
+    0xA9119B60369FFEBD, 0x1FFF7AC80904BF45, 0xAC12FB171817EEE7, 0xAF08DA9177DDA93D,
+    0x1B0CAB936E65C744, 0xB559EB1D04E5E932, 0xC37B45B3F8D6F2BA, 0xC3A9DC228CAAC9E9,
+    0xF3B8B6675A6507FF, 0x9FC477DE4ED681DA, 0x67378D8ECCEF96CB, 0x6DD856D94D259236,
+    0xA319CE15B0B4DB31, 0x073973751F12DD5E, 0x8A8E849EB32781A5, 0xE1925C71285279F5,
+    0x74C04BF1790C0EFE, 0x4DDA48153C94938A, 0x9D266D6A1CC0542C, 0x7440FB816508C4FE,
+    0x13328503DF48229F, 0xD6BF7BAEE43CAC40, 0x4838D65F6EF6748F, 0x1E152328F3318DEA,
+    0x8F8419A348F296BF, 0x72C8834A5957B511, 0xD7A023A73260B45C, 0x94EBC8ABCFB56DAE,
+    0x9FC10D0F989993E0, 0xDE68A2355B93CAE6, 0xA44CFE79AE538BBE, 0x9D1D84FCCE371425,
+    0x51D2B1AB2DDFB636, 0x2FD7E4B9E72CD38C, 0x65CA5B96B7552210, 0xDD69A0D8AB3B546D,
+    0x604D51B25FBF70E2, 0x73AA8A564FB7AC9E, 0x1A8C1E992B941148, 0xAAC40A2703D9BEA0,
+    0x764DBEAE7FA4F3A6, 0x1E99B96E70A9BE8B, 0x2C5E9DEB57EF4743, 0x3A938FEE32D29981,
+    0x26E6DB8FFDF5ADFE, 0x469356C504EC9F9D, 0xC8763C5B08D1908C, 0x3F6C6AF859D80055,
+    0x7F7CC39420A3A545, 0x9BFB227EBDF4C5CE, 0x89039D79D6FC5C5C, 0x8FE88B57305E2AB6,
+    0xA09E8C8C35AB96DE, 0xFA7E393983325753, 0xD6B6D0ECC617C699, 0xDFEA21EA9E7557E3,
+    0xB67C1FA481680AF8, 0xCA1E3785A9E724E5, 0x1CFC8BED0D681639, 0xD18D8549D140CAEA,
+    0x4ED0FE7E9DC91335, 0xE4DBF0634473F5D2, 0x1761F93A44D5AEFE, 0x53898E4C3910DA55,
+    0x734DE8181F6EC39A, 0x2680B122BAA28D97, 0x298AF231C85BAFAB, 0x7983EED3740847D5,
+    0x66C1A2A1A60CD889, 0x9E17E49642A3E4C1, 0xEDB454E7BADC0805, 0x50B704CAB602C329,
+    0x4CC317FB9CDDD023, 0x66B4835D9EAFEA22, 0x219B97E26FFC81BD, 0x261E4E4C0A333A9D,
+    0x1FE2CCA76517DB90, 0xD7504DFA8816EDBB, 0xB9571FA04DC089C8, 0x1DDC0325259B27DE,
+    0xCF3F4688801EB9AA, 0xF4F5D05C10CAB243, 0x38B6525C21A42B0E, 0x36F60E2BA4FA6800,
+    0xEB3593803173E0CE, 0x9C4CD6257C5A3603, 0xAF0C317D32ADAA8A, 0x258E5A80C7204C4B,
+    0x8B889D624D44885D, 0xF4D14597E660F855, 0xD4347F66EC8941C3, 0xE699ED85B0DFB40D,
+    0x2472F6207C2D0484, 0xC2A1E7B5B459AEB5, 0xAB4F6451CC1D45EC, 0x63767572AE3D6174,
+    0xA59E0BD101731A28, 0x116D0016CB948F09, 0x2CF9C8CA052F6E9F, 0x0B090A7560A968E3,
+    0xABEEDDB2DDE06FF1, 0x58EFC10B06A2068D, 0xC6E57A78FBD986E0, 0x2EAB8CA63CE802D7,
+    0x14A195640116F336, 0x7C0828DD624EC390, 0xD74BBE77E6116AC7, 0x804456AF10F5FB53,
+    0xEBE9EA2ADF4321C7, 0x03219A39EE587A30, 0x49787FEF17AF9924, 0xA1E9300CD8520548,
+    0x5B45E522E4B1B4EF, 0xB49C3B3995091A36, 0xD4490AD526F14431, 0x12A8F216AF9418C2,
+    0x001F837CC7350524, 0x1877B51E57A764D5, 0xA2853B80F17F58EE, 0x993E1DE72D36D310,
+    0xB3598080CE64A656, 0x252F59CF0D9F04BB, 0xD23C8E176D113600, 0x1BDA0492E7E4586E,
+    0x21E0BD5026C619BF, 0x3B097ADAF088F94E, 0x8D14DEDB30BE846E, 0xF95CFFA23AF5F6F4,
+    0x3871700761B3F743, 0xCA672B91E9E4FA16, 0x64C8E531BFF53B55, 0x241260ED4AD1E87D,
+    0x106C09B972D2E822, 0x7FBA195410E5CA30, 0x7884D9BC6CB569D8, 0x0647DFEDCD894A29,
+    0x63573FF03E224774, 0x4FC8E9560F91B123, 0x1DB956E450275779, 0xB8D91274B9E9D4FB,
+    0xA2EBEE47E2FBFCE1, 0xD9F1F30CCD97FB09, 0xEFED53D75FD64E6B, 0x2E6D02C36017F67F,
+    0xA9AA4D20DB084E9B, 0xB64BE8D8B25396C1, 0x70CB6AF7C2D5BCF0, 0x98F076A4F7A2322E,
+    0xBF84470805E69B5F, 0x94C3251F06F90CF3, 0x3E003E616A6591E9, 0xB925A6CD0421AFF3,
+    0x61BDD1307C66E300, 0xBF8D5108E27E0D48, 0x240AB57A8B888B20, 0xFC87614BAF287E07,
+    0xEF02CDD06FFDB432, 0xA1082C0466DF6C0A, 0x8215E577001332C8, 0xD39BB9C3A48DB6CF,
+    0x2738259634305C14, 0x61CF4F94C97DF93D, 0x1B6BACA2AE4E125B, 0x758F450C88572E0B,
+    0x959F587D507A8359, 0xB063E962E045F54D, 0x60E8ED72C0DFF5D1, 0x7B64978555326F9F,
+    0xFD080D236DA814BA, 0x8C90FD9B083F4558, 0x106F72FE81E2C590, 0x7976033A39F7D952,
+    0xA4EC0132764CA04B, 0x733EA705FAE4FA77, 0xB4D8F77BC3E56167, 0x9E21F4F903B33FD9,
+    0x9D765E419FB69F6D, 0xD30C088BA61EA5EF, 0x5D94337FBFAF7F5B, 0x1A4E4822EB4D7A59,
+    0x6FFE73E81B637FB3, 0xDDF957BC36D8B9CA, 0x64D0E29EEA8838B3, 0x08DD9BDFD96B9F63,
+    0x087E79E5A57D1D13, 0xE328E230E3E2B3FB, 0x1C2559E30F0946BE, 0x720BF5F26F4D2EAA,
+    0xB0774D261CC609DB, 0x443F64EC5A371195, 0x4112CF68649A260E, 0xD813F2FAB7F5C5CA,
+    0x660D3257380841EE, 0x59AC2C7873F910A3, 0xE846963877671A17, 0x93B633ABFA3469F8,
+    0xC0C0F5A60EF4CDCF, 0xCAF21ECD4377B28C, 0x57277707199B8175, 0x506C11B9D90E8B1D,
+    0xD83CC2687A19255F, 0x4A29C6465A314CD1, 0xED2DF21216235097, 0xB5635C95FF7296E2,
+    0x22AF003AB672E811, 0x52E762596BF68235, 0x9AEBA33AC6ECC6B0, 0x944F6DE09134DFB6,
+    0x6C47BEC883A7DE39, 0x6AD047C430A12104, 0xA5B1CFDBA0AB4067, 0x7C45D833AFF07862,
+    0x5092EF950A16DA0B, 0x9338E69C052B8E7B, 0x455A4B4CFE30E3F5, 0x6B02E63195AD0CF8,
+    0x6B17B224BAD6BF27, 0xD1E0CCD25BB9C169, 0xDE0C89A556B9AE70, 0x50065E535A213CF6,
+    0x9C1169FA2777B874, 0x78EDEFD694AF1EED, 0x6DC93D9526A50E68, 0xEE97F453F06791ED,
+    0x32AB0EDB696703D3, 0x3A6853C7E70757A7, 0x31865CED6120F37D, 0x67FEF95D92607890,
+    0x1F2B1D1F15F6DC9C, 0xB69E38A8965C6B65, 0xAA9119FF184CCCF4, 0xF43C732873F24C13,
+    0xFB4A3D794A9A80D2, 0x3550C2321FD6109C, 0x371F77E76BB8417E, 0x6BFA9AAE5EC05779,
+    0xCD04F3FF001A4778, 0xE3273522064480CA, 0x9F91508BFFCFC14A, 0x049A7F41061A9E60,
+    0xFCB6BE43A9F2FE9B, 0x08DE8A1C7797DA9B, 0x8F9887E6078735A1, 0xB5B4071DBFC73A66,
+    0x230E343DFBA08D33, 0x43ED7F5A0FAE657D, 0x3A88A0FBBCB05C63, 0x21874B8B4D2DBC4F,
+    0x1BDEA12E35F6A8C9, 0x53C065C6C8E63528, 0xE34A1D250E7A8D6B, 0xD6B04D3B7651DD7E,
+    0x5E90277E7CB39E2D, 0x2C046F22062DC67D, 0xB10BB459132D0A26, 0x3FA9DDFB67E2F199,
+    0x0E09B88E1914F7AF, 0x10E8B35AF3EEAB37, 0x9EEDECA8E272B933, 0xD4C718BC4AE8AE5F,
+    0x81536D601170FC20, 0x91B534F885818A06, 0xEC8177F83F900978, 0x190E714FADA5156E,
+    0xB592BF39B0364963, 0x89C350C893AE7DC1, 0xAC042E70F8B383F2, 0xB49B52E587A1EE60,
+    0xFB152FE3FF26DA89, 0x3E666E6F69AE2C15, 0x3B544EBE544C19F9, 0xE805A1E290CF2456,
+    0x24B33C9D7ED25117, 0xE74733427B72F0C1, 0x0A804D18B7097475, 0x57E3306D881EDB4F,
+    0x4AE7D6A36EB5DBCB, 0x2D8D5432157064C8, 0xD1E649DE1E7F268B, 0x8A328A1CEDFE552C,
+    0x07A3AEC79624C7DA, 0x84547DDC3E203C94, 0x990A98FD5071D263, 0x1A4FF12616EEFC89,
+    0xF6F7FD1431714200, 0x30C05B1BA332F41C, 0x8D2636B81555A786, 0x46C9FEB55D120902,
+    0xCCEC0A73B49C9921, 0x4E9D2827355FC492, 0x19EBB029435DCB0F, 0x4659D2B743848A2C,
+    0x963EF2C96B33BE31, 0x74F85198B05A2E7D, 0x5A0F544DD2B1FB18, 0x03727073C2E134B1,
+    0xC7F6AA2DE59AEA61, 0x352787BAA0D7C22F, 0x9853EAB63B5E0B35, 0xABBDCDD7ED5C0860,
+    0xCF05DAF5AC8D77B0, 0x49CAD48CEBF4A71E, 0x7A4C10EC2158C4A6, 0xD9E92AA246BF719E,
+    0x13AE978D09FE5557, 0x730499AF921549FF, 0x4E4B705B92903BA4, 0xFF577222C14F0A3A,
+    0x55B6344CF97AAFAE, 0xB862225B055B6960, 0xCAC09AFBDDD2CDB4, 0xDAF8E9829FE96B5F,
+    0xB5FDFC5D3132C498, 0x310CB380DB6F7503, 0xE87FBB46217A360E, 0x2102AE466EBB1148,
+    0xF8549E1A3AA5E00D, 0x07A69AFDCC42261A, 0xC4C118BFE78FEAAE, 0xF9F4892ED96BD438,
+    0x1AF3DBE25D8F45DA, 0xF5B4B0B0D2DEEEB4, 0x962ACEEFA82E1C84, 0x046E3ECAAF453CE9,
+    0xF05D129681949A4C, 0x964781CE734B3C84, 0x9C2ED44081CE5FBD, 0x522E23F3925E319E,
+    0x177E00F9FC32F791, 0x2BC60A63A6F3B3F2, 0x222BBFAE61725606, 0x486289DDCC3D6780,
+    0x7DC7785B8EFDFC80, 0x8AF38731C02BA980, 0x1FAB64EA29A2DDF7, 0xE4D9429322CD065A,
+    0x9DA058C67844F20C, 0x24C0E332B70019B0, 0x233003B5A6CFE6AD, 0xD586BD01C5C217F6,
+    0x5E5637885F29BC2B, 0x7EBA726D8C94094B, 0x0A56A5F0BFE39272, 0xD79476A84EE20D06,
+    0x9E4C1269BAA4BF37, 0x17EFEE45B0DEE640, 0x1D95B0A5FCF90BC6, 0x93CBE0B699C2585D,
+    0x65FA4F227A2B6D79, 0xD5F9E858292504D5, 0xC2B5A03F71471A6F, 0x59300222B4561E00,
+    0xCE2F8642CA0712DC, 0x7CA9723FBB2E8988, 0x2785338347F2BA08, 0xC61BB3A141E50E8C,
+    0x150F361DAB9DEC26, 0x9F6A419D382595F4, 0x64A53DC924FE7AC9, 0x142DE49FFF7A7C3D,
+    0x0C335248857FA9E7, 0x0A9C32D5EAE45305, 0xE6C42178C4BBB92E, 0x71F1CE2490D20B07,
+    0xF1BCC3D275AFE51A, 0xE728E8C83C334074, 0x96FBF83A12884624, 0x81A1549FD6573DA5,
+    0x5FA7867CAF35E149, 0x56986E2EF3ED091B, 0x917F1DD5F8886C61, 0xD20D8C88C8FFE65F,
+    0x31D71DCE64B2C310, 0xF165B587DF898190, 0xA57E6339DD2CF3A0, 0x1EF6E6DBB1961EC9,
+    0x70CC73D90BC26E24, 0xE21A6B35DF0C3AD7, 0x003A93D8B2806962, 0x1C99DED33CB890A1,
+    0xCF3145DE0ADD4289, 0xD0E4427A5514FB72, 0x77C621CC9FB3A483, 0x67A34DAC4356550B,
+    0xF8D626AAAF278509,
+)
+
+# Polyglot numbers piece kinds black pawn, white pawn, black knight, ... and squares a1..h8
+ZOBRIST_PIECE_KEYS = {
+    color + piece_type: tuple(POLYGLOT_RANDOM_64[64 * (2 * kind + (color == 'w')) + 8 * (7 - square // 8) + square % 8]
+                              for square in range(64))
+    for kind, piece_type in enumerate(PIECE_TYPES) for color in 'wb'}
+# Indexed by white king side | white queen side << 1 | black king side << 2 | black queen side << 3
+ZOBRIST_CASTLE_KEYS = tuple(
+    (POLYGLOT_RANDOM_64[768] if rights & 1 else 0) ^ (POLYGLOT_RANDOM_64[769] if rights & 2 else 0) ^
+    (POLYGLOT_RANDOM_64[770] if rights & 4 else 0) ^ (POLYGLOT_RANDOM_64[771] if rights & 8 else 0)
+    for rights in range(16))
+ZOBRIST_EN_PASSANT_KEYS = POLYGLOT_RANDOM_64[772:780]
+ZOBRIST_TURN_KEY = POLYGLOT_RANDOM_64[780]
+# The pawn keys again with every other piece's zeroed, so GameState.pawn_key is kept without a branch
+ZOBRIST_PAWN_KEYS = {piece: keys if piece[1] == 'P' else (0,) * 64 for piece, keys in ZOBRIST_PIECE_KEYS.items()}
+
+
+# ==========================================
+# EVALUATION TABLES
+# ==========================================
+# Piece values and piece-square tables in centipawns, one set for the middlegame and one for the endgame
+# (the PeSTO tables). Squares run a8..h1 like GameState.squares and are written from White's side;
+# Black reads them mirrored. GameState keeps both sums up to date as pieces move.
+
+MIDDLEGAME_VALUES = {'P': 82, 'N': 337, 'B': 365, 'R': 477, 'Q': 1025, 'K': 0}
+ENDGAME_VALUES = {'P': 94, 'N': 281, 'B': 297, 'R': 512, 'Q': 936, 'K': 0}
+
+MIDDLEGAME_TABLES = {
+    'P': (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        98, 134, 61, 95, 68, 126, 34, -11,
+        -6, 7, 26, 31, 65, 56, 25, -20,
+        -14, 13, 6, 21, 23, 12, 17, -23,
+        -27, -2, -5, 12, 17, 6, 10, -25,
+        -26, -4, -4, -10, 3, 3, 33, -12,
+        -35, -1, -20, -23, -15, 24, 38, -22,
+        0, 0, 0, 0, 0, 0, 0, 0),
+    'N': (
+        -167, -89, -34, -49, 61, -97, -15, -107,
+        -73, -41, 72, 36, 23, 62, 7, -17,
+        -47, 60, 37, 65, 84, 129, 73, 44,
+        -9, 17, 19, 53, 37, 69, 18, 22,
+        -13, 4, 16, 13, 28, 19, 21, -8,
+        -23, -9, 12, 10, 19, 17, 25, -16,
+        -29, -53, -12, -3, -1, 18, -14, -19,
+        -105, -21, -58, -33, -17, -28, -19, -23),
+    'B': (
+        -29, 4, -82, -37, -25, -42, 7, -8,
+        -26, 16, -18, -13, 30, 59, 18, -47,
+        -16, 37, 43, 40, 35, 50, 37, -2,
+        -4, 5, 19, 50, 37, 37, 7, -2,
+        -6, 13, 13, 26, 34, 12, 10, 4,
+        0, 15, 15, 15, 14, 27, 18, 10,
+        4, 15, 16, 0, 7, 21, 33, 1,
+        -33, -3, -14, -21, -13, -12, -39, -21),
+    'R': (
+        32, 42, 32, 51, 63, 9, 31, 43,
+        27, 32, 58, 62, 80, 67, 26, 44,
+        -5, 19, 26, 36, 17, 45, 61, 16,
+        -24, -11, 7, 26, 24, 35, -8, -20,
+        -36, -26, -12, -1, 9, -7, 6, -23,
+        -45, -25, -16, -17, 3, 0, -5, -33,
+        -44, -16, -20, -9, -1, 11, -6, -71,
+        -19, -13, 1, 17, 16, 7, -37, -26),
+    'Q': (
+        -28, 0, 29, 12, 59, 44, 43, 45,
+        -24, -39, -5, 1, -16, 57, 28, 54,
+        -13, -17, 7, 8, 29, 56, 47, 57,
+        -27, -27, -16, -16, -1, 17, -2, 1,
+        -9, -26, -9, -10, -2, -4, 3, -3,
+        -14, 2, -11, -2, -5, 2, 14, 5,
+        -35, -8, 11, 2, 8, 15, -3, 1,
+        -1, -18, -9, 10, -15, -25, -31, -50),
+    'K': (
+        -65, 23, 16, -15, -56, -34, 2, 13,
+        29, -1, -20, -7, -8, -4, -38, -29,
+        -9, 24, 2, -16, -20, 6, 22, -22,
+        -17, -20, -12, -27, -30, -25, -14, -36,
+        -49, -1, -27, -39, -46, -44, -33, -51,
+        -14, -14, -22, -46, -44, -30, -15, -27,
+        1, 7, -8, -64, -43, -16, 9, 8,
+        -15, 36, 12, -54, 8, -28, 24, 14),
+}
+
+ENDGAME_TABLES = {
+    'P': (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        178, 173, 158, 134, 147, 132, 165, 187,
+        94, 100, 85, 67, 56, 53, 82, 84,
+        32, 24, 13, 5, -2, 4, 17, 17,
+        13, 9, -3, -7, -7, -8, 3, -1,
+        4, 7, -6, 1, 0, -5, -1, -8,
+        13, 8, 8, 10, 13, 0, 2, -7,
+        0, 0, 0, 0, 0, 0, 0, 0),
+    'N': (
+        -58, -38, -13, -28, -31, -27, -63, -99,
+        -25, -8, -25, -2, -9, -25, -24, -52,
+        -24, -20, 10, 9, -1, -9, -19, -41,
+        -17, 3, 22, 22, 22, 11, 8, -18,
+        -18, -6, 16, 25, 16, 17, 4, -18,
+        -23, -3, -1, 15, 10, -3, -20, -22,
+        -42, -20, -10, -5, -2, -20, -23, -44,
+        -29, -51, -23, -15, -22, -18, -50, -64),
+    'B': (
+        -14, -21, -11, -8, -7, -9, -17, -24,
+        -8, -4, 7, -12, -3, -13, -4, -14,
+        2, -8, 0, -1, -2, 6, 0, 4,
+        -3, 9, 12, 9, 14, 10, 3, 2,
+        -6, 3, 13, 19, 7, 10, -3, -9,
+        -12, -3, 8, 10, 13, 3, -7, -15,
+        -14, -18, -7, -1, 4, -9, -15, -27,
+        -23, -9, -23, -5, -9, -16, -5, -17),
+    'R': (
+        13, 10, 18, 15, 12, 12, 8, 5,
+        11, 13, 13, 11, -3, 3, 8, 3,
+        7, 7, 7, 5, 4, -3, -5, -3,
+        4, 3, 13, 1, 2, 1, -1, 2,
+        3, 5, 8, 4, -5, -6, -8, -11,
+        -4, 0, -5, -1, -7, -12, -8, -16,
+        -6, -6, 0, 2, -9, -9, -11, -3,
+        -9, 2, 3, -1, -5, -13, 4, -20),
+    'Q': (
+        -9, 22, 22, 27, 27, 19, 10, 20,
+        -17, 20, 32, 41, 58, 25, 30, 0,
+        -20, 6, 9, 49, 47, 35, 19, 9,
+        3, 22, 24, 45, 57, 40, 57, 36,
+        -18, 28, 19, 47, 31, 34, 39, 23,
+        -16, -27, 15, 6, 9, 17, 10, 5,
+        -22, -23, -30, -16, -16, -23, -36, -32,
+        -33, -28, -22, -43, -5, -32, -20, -41),
+    'K': (
+        -74, -35, -18, -18, -11, 15, 4, -17,
+        -12, 17, 14, 17, 17, 38, 23, 11,
+        10, 17, 23, 15, 20, 45, 44, 13,
+        -8, 22, 24, 27, 26, 33, 26, 3,
+        -18, -4, 21, 24, 27, 23, 9, -11,
+        -19, -3, 11, 21, 23, 16, 7, -9,
+        -27, -11, 4, 13, 14, 4, -5, -17,
+        -53, -34, -21, -11, -28, -14, -24, -43),
+}
+
+WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weights.json')  # Optional, written by tune.py
+
+
+def load_weights(path=WEIGHTS_PATH):
+    """Evaluation weights fitted by tune.py, or {} to keep the hand-set ones when there is no readable file"""
+    try:
+        with open(path) as weights_file:
+            return json.load(weights_file)
+    except (OSError, ValueError):
+        return {}
+
+
+EVALUATION_WEIGHTS = load_weights()
+MIDDLEGAME_VALUES = EVALUATION_WEIGHTS.get('middlegame_values', MIDDLEGAME_VALUES)
+ENDGAME_VALUES = EVALUATION_WEIGHTS.get('endgame_values', ENDGAME_VALUES)
+MIDDLEGAME_TABLES = {piece_type: tuple(table)
+                     for piece_type, table in EVALUATION_WEIGHTS.get('middlegame_tables', MIDDLEGAME_TABLES).items()}
+ENDGAME_TABLES = {piece_type: tuple(table)
+                  for piece_type, table in EVALUATION_WEIGHTS.get('endgame_tables', ENDGAME_TABLES).items()}
+
+# Game phase: 24 with all minor and major pieces on the board, 0 with only kings and pawns left
+PHASE_WEIGHTS = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+TOTAL_PHASE = 24
+
+
+def square_scores(values, tables):
+    """Per piece string, the signed (White positive) value plus table bonus of that piece on each square"""
+    return {color + piece_type: tuple((values[piece_type] + tables[piece_type][square]) if color == 'w'
+                                      else -(values[piece_type] + tables[piece_type][square ^ 56])
+                                      for square in range(64))
+            for piece_type in PIECE_TYPES for color in 'wb'}
+
+
+MIDDLEGAME_SCORES = square_scores(MIDDLEGAME_VALUES, MIDDLEGAME_TABLES)
+ENDGAME_SCORES = square_scores(ENDGAME_VALUES, ENDGAME_TABLES)
+PIECE_PHASES = {piece: PHASE_WEIGHTS[piece[1]] for piece in PIECES}
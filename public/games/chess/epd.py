@@ -0,0 +1,135 @@
+"""
+Runs the AI over an EPD test suite (WAC, STS and the like) to get a strength and speed baseline.
+Each line is a position followed by operations; a position counts as solved when the move played
+is one of its bm (best move) operands and none of its am (avoid move) operands. Runs headless under
+plain CPython, spreading positions across worker processes:
+
+    python epd.py wac.epd                        # 1 second per position on every CPU
+    python epd.py wac.epd --movetime 250 --processes 4
+    python epd.py sts1.epd --nodes 200000 --verbose  # Node limit instead of time, for repeatable runs
+    python epd.py wac.epd --depth 5 --disable late_move_reductions  # A/B node counts at a fixed depth
+"""
+
+import argparse
+import math
+import os
+import re
+import time
+from multiprocessing import Pool
+
+import ai
+from engine import GameState, Move
+
+
+def parse_epd(line):
+    """Returns (fen, {opcode: [operands]}) for one EPD line, or None for a blank or comment line"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    fields = line.split(maxsplit=4)
+    if len(fields) < 4:
+        raise ValueError(f"EPD needs at least 4 fields: {line!r}")
+    fen = ' '.join(fields[:4]) + ' 0 1'
+    operations = {}
+    for operation in re.findall(r'(?:[^;"]|"[^"]*")+', fields[4] if len(fields) > 4 else ''):
+        words = re.findall(r'"[^"]*"|\S+', operation)
+        if words:
+            operations[words[0]] = [word.strip('"') for word in words[1:]]
+    return fen, operations
+
+
+def clean_san(san):
+    """Strips check marks and annotations, so 'Qxf7+!' and 'Qxf7' compare equal"""
+    return san.replace('0', 'O').rstrip('+#!?')
+
+
+def san(gs, move):
+    """Standard algebraic notation of a legal move in gs, without check marks"""
+    view = Move.from_code(move)
+    if view.is_castle_move:
+        return str(view)
+    end = view.get_rank_file(view.end_row, view.end_column)
+    piece_type = view.piece_moved[1]
+    if piece_type == 'P':
+        notation = f'{view.columns_to_files[view.start_column]}x{end}' if view.is_capture else end
+        return notation + '=Q' if view.is_pawn_promotion else notation
+    rivals = [other for other in map(Move.from_code, gs.get_valid_moves())
+              if other.code != move and other.piece_moved == view.piece_moved and
+              (other.end_row, other.end_column) == (view.end_row, view.end_column)]
+    start = ''
+    if rivals:
+        if all(rival.start_column != view.start_column for rival in rivals):
+            start = view.columns_to_files[view.start_column]
+        elif all(rival.start_row != view.start_row for rival in rivals):
+            start = view.rows_to_ranks[view.start_row]
+        else:
+            start = view.get_rank_file(view.start_row, view.start_column)
+    return f"{piece_type}{start}{'x' if view.is_capture else ''}{end}"
+
+
+def solve(task):
+    """
+    Worker entry point: (EPD line, time limit in ms, node limit, depth limit, disabled search features)
+    -> result dict for that position
+    """
+    line, movetime, nodes, depth, disabled = task
+    fen, operations = parse_epd(line)
+    gs = GameState.from_fen(fen)
+    for feature in ai.SEARCH_FEATURES:
+        setattr(ai, feature, feature not in disabled)
+    ai.transposition_table.clear()  # Every position starts cold, so results do not depend on the order run
+    start = time.perf_counter()
+    move = ai.find_best_move(gs, gs.get_valid_moves(), movetime, depth, use_book=False, node_limit=nodes)
+    elapsed = time.perf_counter() - start
+    played = san(gs, move) if move is not None else '-'
+    best = [clean_san(operand) for operand in operations.get('bm', [])]
+    avoid = [clean_san(operand) for operand in operations.get('am', [])]
+    solved = (not best or played in best) and played not in avoid and bool(best or avoid)
+    return {'id': (operations.get('id') or [fen])[0], 'played': played, 'best': best, 'avoid': avoid,
+            'solved': solved, 'nodes': ai.time_manager.nodes, 'seconds': elapsed}
+
+
+def run(lines, movetime, nodes, processes, verbose=False, depth=ai.MAX_DEPTH, disabled=()):
+    """Solves every position, printing each result as it arrives; returns the list of results"""
+    tasks = [(line, movetime, nodes, depth, disabled) for line in lines]
+    results = []
+    with Pool(processes) as pool:
+        for result in pool.imap(solve, tasks, chunksize=1):
+            results.append(result)
+            if verbose or not result['solved']:
+                expected = ' '.join(['bm'] + result['best'] if result['best'] else ['am'] + result['avoid'])
+                print(f"{'ok  ' if result['solved'] else 'MISS'} {result['id']}: played {result['played']}, "
+                      f"{expected} ({result['nodes']} nodes, {result['seconds']:.2f}s)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the chess AI over an EPD test suite")
+    parser.add_argument('suite', help="EPD file with bm and/or am operations")
+    parser.add_argument('--movetime', type=int,
+                        help="Search time per position in milliseconds (default 1000 unless --nodes or --depth is given)")
+    parser.add_argument('--nodes', type=int, help="Node limit per position")
+    parser.add_argument('--depth', type=int, default=ai.MAX_DEPTH, help="Depth limit per position")
+    parser.add_argument('--disable', nargs='+', default=[], choices=[name.lower() for name in ai.SEARCH_FEATURES],
+                        help="Search features to switch off, to compare node counts")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--verbose', action='store_true', help="Print solved positions too, not just misses")
+    args = parser.parse_args()
+
+    with open(args.suite) as suite_file:
+        lines = [line for line in suite_file if parse_epd(line) is not None]
+    start = time.perf_counter()
+    movetime = args.movetime or (math.inf if args.nodes or args.depth < ai.MAX_DEPTH else 1000)
+    disabled = tuple(name.upper() for name in args.disable)
+    results = run(lines, movetime, args.nodes or math.inf, args.processes, args.verbose, args.depth, disabled)
+    elapsed = time.perf_counter() - start
+    solved = sum(result['solved'] for result in results)
+    nodes = sum(result['nodes'] for result in results)
+    search_seconds = sum(result['seconds'] for result in results)
+    print(f"\nSolved {solved}/{len(results)} in {elapsed:.1f}s with {args.processes} processes")
+    print(f"Nodes: {nodes} ({nodes / max(search_seconds, 1e-9):,.0f} nodes/s per process, "
+          f"{nodes / max(elapsed, 1e-9):,.0f} nodes/s overall)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Parallel search for offline analysis and AI regression testing under plain CPython. Worker
+processes share one transposition table in shared memory and either search the whole tree
+side by side (Lazy SMP: whichever finishes the depth first answers, and the others mostly
+find their work already in the table) or split the root moves between them:
+
+    python parallel.py                               # Speedup for 1, 2 and 4 processes on the position set
+    python parallel.py --processes 1 2 4 8 --depth 5
+    python parallel.py --mode split
+    python parallel.py --fen "<FEN>" --depth 6 --processes 4
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from multiprocessing import Pool, shared_memory
+
+import ai
+from engine import GameState, Move
+
+
+POSITIONS = (
+    ('Start position', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'),
+    ('Kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'),
+    ('Position 4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1'),
+    ('Position 5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8'),
+    ('Position 6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10'),
+    ('Queen\'s Gambit Declined', 'r1bq1rk1/pp2bppp/2n1pn2/2pp4/2PP4/2N1PN2/PP2BPPP/R1BQ1RK1 w - - 0 8'),
+)
+FLAG_BYTES = 8  # Stop flag ahead of the table in the shared block
+
+worker_memory = None  # The shared block, kept referenced so it stays mapped
+stop_flag = None
+
+
+class SharedTranspositionTable(ai.TranspositionTable):
+    """TranspositionTable whose arrays are views of a shared memory block, so every process sees every entry"""
+
+    def __init__(self, buffer, size_kb=ai.TT_SIZE_KB):
+        self.size = self.slot_count(size_kb)
+        self.bucket_mask = self.size - 2
+        self.buffer = buffer[FLAG_BYTES:FLAG_BYTES + 16 * self.size]
+        words = self.buffer.cast('Q')
+        self.keys = words[:self.size]
+        self.data = words[self.size:]
+        self.generation = 1
+
+    @classmethod
+    def block_bytes(cls, size_kb):
+        return FLAG_BYTES + 16 * cls.slot_count(size_kb)
+
+    def clear(self):
+        self.buffer[:] = bytes(len(self.buffer))
+        self.generation = 1
+
+
+class SharedStopTimeManager(ai.TimeManager):
+    """TimeManager that also stops as soon as any process raises the shared stop flag"""
+
+    def __init__(self, budget_ms, flag):
+        super().__init__(budget_ms)
+        self.flag = flag
+
+    def check(self):
+        if self.flag[0]:
+            self.stopped = True
+        return super().check()
+
+
+def attach(memory_name, size_kb):
+    """Worker initializer: points the AI at the shared table"""
+    global worker_memory, stop_flag
+    worker_memory = shared_memory.SharedMemory(name=memory_name)
+    stop_flag = worker_memory.buf[:FLAG_BYTES]
+    ai.transposition_table = SharedTranspositionTable(worker_memory.buf, size_kb)
+    random.seed(os.getpid())  # Forked workers would otherwise all shuffle their root moves the same way
+
+
+def search_worker(task):
+    """
+    Worker entry point: (fen, depth, root move notations or None for all, raise stop when done) ->
+    (deepest completed depth, move, score). A worker that completes depth raises the stop flag
+    if asked, so the others give up.
+    """
+    fen, depth, notations, raise_stop = task
+    gs = GameState.from_fen(fen)
+    moves = gs.get_valid_moves()
+    if notations is not None:
+        moves = [move for move in moves if Move.from_code(move).get_chess_notation() in notations]
+    completed = [(0, None, -ai.CHECKMATE)]
+    ai.time_manager = SharedStopTimeManager(math.inf, stop_flag)
+    for _ in ai.search_best_move(gs, moves, depth,
+                                 lambda done, move, score, elapsed_ms: completed.append((done, move, score)),
+                                 store=notations is None):  # A share of the root moves says nothing about the root
+        pass
+    if raise_stop and not ai.time_manager.stopped:
+        stop_flag[0] = 1
+    return completed[-1]
+
+
+class ParallelSearch:
+    """A pool of search processes sharing one transposition table; use it as a context manager"""
+
+    def __init__(self, processes, size_kb=ai.TT_SIZE_KB):
+        self.processes = processes
+        self.memory = shared_memory.SharedMemory(create=True, size=SharedTranspositionTable.block_bytes(size_kb))
+        self.table = SharedTranspositionTable(self.memory.buf, size_kb)
+        self.flag = self.memory.buf[:FLAG_BYTES]
+        self.pool = Pool(processes, initializer=attach, initargs=(self.memory.name, size_kb))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        del self.table, self.flag  # Views must go before the block can close
+        self.memory.close()
+        self.memory.unlink()
+
+    def search(self, fen, depth, mode='lazy'):
+        """Returns (move, score) for fen searched to depth, starting from an empty table"""
+        self.table.clear()
+        self.flag[0] = 0
+        if mode == 'lazy':
+            tasks = [(fen, depth, None, True)] * self.processes
+        else:
+            notations = [move.get_chess_notation() for move in GameState.from_fen(fen).get_valid_move_views()]
+            tasks = [(fen, depth, set(notations[index::self.processes]), False)
+                     for index in range(min(self.processes, len(notations)))]
+        results = self.pool.map(search_worker, tasks, chunksize=1)
+        if mode == 'lazy':
+            _, move, score = max(results, key=lambda result: result[0])  # Deepest, ties to the lowest worker
+        else:
+            _, move, score = max(results, key=lambda result: result[2])
+        return move, score
+
+
+def run(positions, depth, process_counts, mode, size_kb):
+    """Times every position at each process count; returns {processes: total seconds}"""
+    totals = {}
+    baseline_moves = {}
+    for processes in process_counts:
+        total = 0
+        with ParallelSearch(processes, size_kb) as search:
+            for name, fen in positions:
+                start = time.perf_counter()
+                move, score = search.search(fen, depth, mode)
+                elapsed = time.perf_counter() - start
+                total += elapsed
+                notation = Move.from_code(move).get_chess_notation() if move is not None else '-'
+                baseline_moves.setdefault(name, notation)
+                agreement = '' if baseline_moves[name] == notation else f" (differs from {baseline_moves[name]})"
+                print(f"  {processes} x {name}: {notation} {score:+d} in {elapsed:.2f}s{agreement}")
+        totals[processes] = total
+        print(f"{processes} processes: {total:.2f}s, speedup {totals[process_counts[0]] / total:.2f}x\n")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel chess search with a shared transposition table")
+    parser.add_argument('--fen', help="Position to search (default: the built-in position set)")
+    parser.add_argument('--depth', type=int, default=4, help="Depth to search each position to")
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4],
+                        help="Process counts to compare; speedup is against the first")
+    parser.add_argument('--mode', choices=('lazy', 'split'), default='lazy',
+                        help="lazy: every process searches the whole tree; split: root moves are divided up")
+    parser.add_argument('--tt-kb', type=int, default=ai.TT_SIZE_KB * 16, help="Shared transposition table size")
+    args = parser.parse_args()
+
+    positions = [('Position', args.fen)] if args.fen else POSITIONS
+    print(f"{args.mode} search to depth {args.depth} on {os.cpu_count()} CPUs\n")
+    run(positions, args.depth, args.processes, args.mode, args.tt_kb)
+
+
+if __name__ == '__main__':
+    main()
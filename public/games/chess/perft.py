@@ -0,0 +1,124 @@
+"""
+Perft: counts the leaf nodes of the legal move tree to a fixed depth, the standard way to
+check a move generator and to time it. Runs headless under plain CPython:
+
+    python perft.py                          # Standard suite to depth 4, checked against known counts
+    python perft.py --suite --depth 5
+    python perft.py --depth 4                # Start position
+    python perft.py --fen "<FEN>" --depth 3 --divide
+    python perft.py --processes 4            # Split root moves across worker processes
+"""
+
+import argparse
+import time
+from multiprocessing import Pool
+
+from engine import GameState
+
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# Well-known positions with their published node counts. The engine only ever promotes to a
+# queen, so each position stops at the deepest depth whose count includes no underpromotions.
+SUITE = (
+    ('Start position', START_FEN, {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ('Kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     {1: 48, 2: 2039, 3: 97862}),
+    ('Position 3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ('Position 6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+)
+
+
+def perft(gs, depth):
+    """Number of leaf nodes depth plies below gs; the last ply is counted without being played"""
+    moves = gs.get_valid_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        gs.make_move(move)
+        nodes += perft(gs, depth - 1)
+        gs.undo_move()
+    return nodes
+
+
+def perft_after_move(task):
+    """Worker entry point: (fen, move notation, depth) -> nodes below that root move"""
+    fen, notation, depth = task
+    gs = GameState.from_fen(fen)
+    for move in gs.get_valid_move_views():
+        if move.get_chess_notation() == notation:
+            gs.make_move(move.code)
+            return perft(gs, depth - 1)
+    raise ValueError(f"{notation} is not legal in {fen}")
+
+
+def divide(fen, depth, processes=1):
+    """Returns [(move notation, nodes)] for every root move, optionally split across processes"""
+    gs = GameState.from_fen(fen)
+    notations = [move.get_chess_notation() for move in gs.get_valid_move_views()]
+    if depth <= 1:
+        return [(notation, 1) for notation in notations]
+    tasks = [(fen, notation, depth) for notation in notations]
+    if processes > 1:
+        with Pool(processes) as pool:
+            counts = pool.map(perft_after_move, tasks, chunksize=1)
+    else:
+        counts = [perft_after_move(task) for task in tasks]
+    return list(zip(notations, counts))
+
+
+def run(fen, depth, processes=1, show_divide=False):
+    """Runs one perft and prints the node count and speed; returns the node count"""
+    start = time.perf_counter()
+    results = divide(fen, depth, processes)
+    elapsed = time.perf_counter() - start
+    nodes = sum(count for _, count in results)
+    if show_divide:
+        for notation, count in results:
+            print(f"{notation}: {count}")
+        print()
+    print(f"Depth {depth}: {nodes} nodes in {elapsed:.2f}s ({nodes / max(elapsed, 1e-9):,.0f} nodes/s)")
+    return nodes
+
+
+def run_suite(max_depth, processes=1):
+    """Checks every suite position up to max_depth; returns True if all counts match"""
+    all_passed = True
+    total_nodes = 0
+    suite_start = time.perf_counter()
+    for name, fen, counts in SUITE:
+        print(f"{name}: {fen}")
+        for depth in sorted(counts):
+            if depth > max_depth:
+                break
+            nodes = run(fen, depth, processes)
+            total_nodes += nodes
+            if nodes != counts[depth]:
+                all_passed = False
+                print(f"  MISMATCH: expected {counts[depth]}")
+        print()
+    elapsed = time.perf_counter() - suite_start
+    print(f"{'All counts match' if all_passed else 'Some counts differ'}: "
+          f"{total_nodes} nodes in {elapsed:.2f}s ({total_nodes / max(elapsed, 1e-9):,.0f} nodes/s)")
+    return all_passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft node counts for the chess engine")
+    parser.add_argument('--fen', help="Position to count (default: the start position)")
+    parser.add_argument('--depth', type=int, help="Depth to count; with --suite, the deepest depth checked (default 4)")
+    parser.add_argument('--divide', action='store_true', help="Print the node count below each root move")
+    parser.add_argument('--processes', type=int, default=1, help="Worker processes for the root moves")
+    parser.add_argument('--suite', action='store_true', help="Check the standard positions (default with no position or depth)")
+    args = parser.parse_args()
+
+    if args.suite or (args.fen is None and args.depth is None and not args.divide):
+        raise SystemExit(0 if run_suite(args.depth or 4, args.processes) else 1)
+    run(args.fen or START_FEN, args.depth or 4, args.processes, args.divide)
+
+
+if __name__ == '__main__':
+    main()
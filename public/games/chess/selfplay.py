@@ -0,0 +1,242 @@
+"""
+Self-play tournament between this build of the AI and an earlier one, to catch strength and speed
+regressions. Every opening is played twice with colours swapped, games run in parallel worker
+processes, and the report gives the Elo difference with a 95% error margin plus each build's
+average nodes per second and time per move. Runs headless under plain CPython:
+
+    python selfplay.py                                   # Working tree against HEAD, 200 ms a move
+    python selfplay.py --baseline-rev HEAD~3 --nodes 20000 --rounds 4
+    python selfplay.py --baseline /tmp/old-chess --movetime 100 --processes 8
+    python selfplay.py --openings openings.fen --max-plies 300
+
+The baseline is another copy of this directory (or one extracted from a git revision); it must
+take node_limit in find_best_move, as every build with epd.py does. Each build moves on its
+own GameState; a GameState of this build referees, ending games on checkmate and stalemate,
+and calling draws on threefold repetition, bare kings or the ply limit, none of which the
+engine itself tracks.
+"""
+
+import argparse
+import importlib
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+import engine
+from engine import GameState
+
+
+# Three moves a side from the start position (UCI notation), each leaving a balanced game
+OPENINGS = (
+    ('Italian', 'e2e4 e7e5 g1f3 b8c6 f1c4 f8c5'),
+    ('Ruy Lopez', 'e2e4 e7e5 g1f3 b8c6 f1b5 a7a6'),
+    ('Sicilian', 'e2e4 c7c5 g1f3 d7d6 d2d4 c5d4'),
+    ('French', 'e2e4 e7e6 d2d4 d7d5 b1c3 g8f6'),
+    ('Caro-Kann', 'e2e4 c7c6 d2d4 d7d5 e4e5 c8f5'),
+    ('Queen\'s Gambit Declined', 'd2d4 d7d5 c2c4 e7e6 b1c3 g8f6'),
+    ('Slav', 'd2d4 d7d5 c2c4 c7c6 g1f3 g8f6'),
+    ('King\'s Indian', 'd2d4 g8f6 c2c4 g7g6 b1c3 f8g7'),
+    ('English', 'c2c4 e7e5 b1c3 g8f6 g1f3 b8c6'),
+    ('Scandinavian', 'e2e4 d7d5 e4d5 d8d5 b1c3 d5a5'),
+)
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+MAX_PLIES = 240  # Games still going after this many plies are drawn
+
+builds = {}  # 'new' and 'old' -> (engine module, ai module), loaded once per worker
+
+
+def load_build(directory):
+    """
+    Imports engine.py and ai.py from directory as a separate pair of modules, so two builds can
+    live in one process: each ai keeps the engine it imported, whatever sys.modules holds later.
+    """
+    saved = {name: sys.modules.pop(name) for name in ('engine', 'ai') if name in sys.modules}
+    sys.path.insert(0, directory)
+    try:
+        engine_module = importlib.import_module('engine')
+        ai_module = importlib.import_module('ai')
+    finally:
+        sys.path.remove(directory)
+        for name in ('engine', 'ai'):
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+    return engine_module, ai_module
+
+
+def extract_revision(revision, destination):
+    """Writes this directory as it was at a git revision into destination, and returns destination"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    top, prefix = subprocess.run(['git', 'rev-parse', '--show-toplevel', '--show-prefix'], cwd=here, check=True,
+                                 capture_output=True, text=True).stdout.split('\n')[:2]
+    archive = subprocess.run(['git', 'archive', f'{revision}:{prefix}'], cwd=top, check=True,
+                             capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', destination], input=archive, check=True)
+    return destination
+
+
+def attach(new_directory, old_directory):
+    """Worker initializer: loads both builds"""
+    builds['new'] = load_build(new_directory)
+    builds['old'] = load_build(old_directory)
+
+
+def notation(engine_module, move):
+    """Start and end squares of a move from any build, which may hand out ints or Move objects"""
+    view = engine_module.Move.from_code(move) if isinstance(move, int) else move
+    return view.get_chess_notation()
+
+
+def play_notation(engine_module, gs, move_notation):
+    """Plays the legal move with this notation on gs; returns False if there is none"""
+    for move in gs.get_valid_moves():
+        if notation(engine_module, move) == move_notation:
+            gs.make_move(move)
+            return True
+    return False
+
+
+def play_game(task):
+    """
+    Worker entry point: (game number, start FEN, opening moves, whether the new build has White,
+    time per move in ms, node limit, ply limit) -> result dict. score is from the new build's side.
+    """
+    number, fen, opening, new_is_white, movetime, nodes, max_plies = task
+    random.seed(number)  # Root move shuffling differs from game to game but repeats run to run
+    referee = GameState.from_fen(fen)
+    states = {}
+    for name, (engine_module, ai_module) in builds.items():
+        ai_module.transposition_table.clear()
+        states[name] = engine_module.GameState.from_fen(fen)
+    for move_notation in opening:
+        for name, (engine_module, _) in builds.items():
+            play_notation(engine_module, states[name], move_notation)
+        play_notation(engine, referee, move_notation)
+
+    stats = {name: {'moves': 0, 'nodes': 0, 'seconds': 0.0} for name in builds}
+    seen = {}
+    result, reason = 0.5, 'ply limit'
+    while referee.ply < max_plies + len(opening):
+        valid_moves = referee.get_valid_moves()
+        if referee.checkmate:
+            result, reason = (0.0 if referee.white_to_move else 1.0), 'checkmate'
+            break
+        if referee.stalemate:
+            reason = 'stalemate'
+            break
+        seen[referee.zobrist_key] = seen.get(referee.zobrist_key, 0) + 1
+        if seen[referee.zobrist_key] >= 3:
+            reason = 'repetition'
+            break
+        if referee.occupied.bit_count() == 2:
+            reason = 'bare kings'
+            break
+
+        mover = 'new' if referee.white_to_move == new_is_white else 'old'
+        engine_module, ai_module = builds[mover]
+        gs = states[mover]
+        previous_manager = getattr(ai_module, 'time_manager', None)  # Set by the build's first search
+        start = time.perf_counter()
+        move = ai_module.find_best_move(gs, gs.get_valid_moves(), movetime, ai_module.MAX_DEPTH, use_book=False,
+                                        node_limit=nodes)
+        if ai_module.time_manager is not previous_manager:  # Searched rather than played from the tables
+            stats[mover]['moves'] += 1
+            stats[mover]['nodes'] += ai_module.time_manager.nodes
+            stats[mover]['seconds'] += time.perf_counter() - start
+        move_notation = notation(engine_module, move) if move is not None else None
+        if move_notation is None or not play_notation(engine, referee, move_notation):
+            result, reason = (0.0 if referee.white_to_move else 1.0), f'illegal move from {mover}'
+            break
+        for name, (other_engine, _) in builds.items():
+            play_notation(other_engine, states[name], move_notation)
+
+    score = result if new_is_white else 1.0 - result
+    return {'number': number, 'new_is_white': new_is_white, 'score': score, 'reason': reason,
+            'plies': referee.ply, 'stats': stats}
+
+
+def elo_difference(scores):
+    """(Elo difference, 95% margin) for a list of per-game scores (1, 0.5 or 0) from one side"""
+    games = len(scores)
+    mean = sum(scores) / games
+    if mean in (0.0, 1.0):
+        return (math.inf if mean else -math.inf), math.inf
+    deviation = math.sqrt(sum((score - mean) ** 2 for score in scores) / games / games)
+
+    def elo(fraction):
+        fraction = min(max(fraction, 1e-9), 1 - 1e-9)
+        return -400 * math.log10(1 / fraction - 1)
+
+    return elo(mean), (elo(mean + 1.96 * deviation) - elo(mean - 1.96 * deviation)) / 2
+
+
+def starting_positions(openings_path):
+    """(name, FEN, opening moves) for every start: from a file of FENs, or the built-in openings"""
+    if openings_path is None:
+        return [(name, START_FEN, moves.split()) for name, moves in OPENINGS]
+    with open(openings_path) as openings_file:
+        fens = [line.strip() for line in openings_file if line.strip() and not line.startswith('#')]
+    return [(fen, fen if len(fen.split()) > 4 else fen + ' 0 1', []) for fen in fens]
+
+
+def run(new_directory, old_directory, starts, rounds, movetime, nodes, max_plies, processes):
+    """Plays every start twice (once with each colour) per round; returns the list of results"""
+    tasks = []
+    for _ in range(rounds):
+        for name, fen, opening in starts:
+            for new_is_white in (True, False):
+                tasks.append((len(tasks), fen, opening, new_is_white, movetime, nodes, max_plies))
+    results = []
+    with Pool(processes, initializer=attach, initargs=(new_directory, old_directory)) as pool:
+        for result in pool.imap_unordered(play_game, tasks):
+            results.append(result)
+            name = starts[result['number'] // 2 % len(starts)][0]
+            outcome = {1.0: 'win', 0.5: 'draw', 0.0: 'loss'}[result['score']]
+            print(f"{len(results):4}/{len(tasks)} {name} (new as {'White' if result['new_is_white'] else 'Black'}): "
+                  f"{outcome}, {result['reason']}, {result['plies']} plies")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play this build of the chess AI against an earlier one")
+    baseline = parser.add_mutually_exclusive_group()
+    baseline.add_argument('--baseline', help="Directory holding the earlier build's engine.py and ai.py")
+    baseline.add_argument('--baseline-rev', default='HEAD', help="Git revision to take the earlier build from")
+    parser.add_argument('--movetime', type=int,
+                        help="Search time per move in milliseconds (default 200 unless --nodes is given)")
+    parser.add_argument('--nodes', type=int, help="Node limit per move, for results that do not depend on load")
+    parser.add_argument('--rounds', type=int, default=1, help="Times every opening is played with each colour")
+    parser.add_argument('--openings', help="File of start FENs, one per line (default: the built-in openings)")
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help="Plies after which a game is drawn")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="Games played at once")
+    args = parser.parse_args()
+
+    new_directory = os.path.dirname(os.path.abspath(__file__))
+    starts = starting_positions(args.openings)
+    movetime = args.movetime or (math.inf if args.nodes else 200)
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as scratch:
+        old_directory = args.baseline or extract_revision(args.baseline_rev, scratch)
+        results = run(new_directory, os.path.abspath(old_directory), starts, args.rounds, movetime,
+                      args.nodes or math.inf, args.max_plies, args.processes)
+    elapsed = time.perf_counter() - start
+
+    scores = [result['score'] for result in results]
+    wins, draws = scores.count(1.0), scores.count(0.5)
+    elo, margin = elo_difference(scores)
+    print(f"\n{len(results)} games in {elapsed:.1f}s: +{wins} ={draws} -{len(scores) - wins - draws} "
+          f"for the new build, Elo {elo:+.1f} +/- {margin:.1f}")
+    for name in ('new', 'old'):
+        moves = sum(result['stats'][name]['moves'] for result in results)
+        nodes = sum(result['stats'][name]['nodes'] for result in results)
+        seconds = sum(result['stats'][name]['seconds'] for result in results)
+        print(f"{name}: {nodes / max(seconds, 1e-9):,.0f} nodes/s, {seconds * 1000 / max(moves, 1):.0f} ms/move "
+              f"over {moves} searched moves")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Checks of the AI search under plain CPython:
+
+    python -m unittest test_search
+"""
+
+import math
+import unittest
+
+import ai
+import uci
+from engine import GameState, Move
+
+
+MATE_IN_TWO_FEN = 'kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1'  # 1. Ra6 bxa6 2. b7#
+MIDDLEGAME_FEN = 'r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R1BQKB1R w KQ - 0 1'
+
+
+def search(gs, depth, lines=1, store=True, valid_moves=None, clear=True):
+    """Runs search_best_move to depth, from a cold table unless clear is False; returns the best move"""
+    if clear:
+        ai.transposition_table.clear()
+    ai.time_manager = ai.TimeManager(math.inf)
+    for _ in ai.search_best_move(gs, valid_moves or gs.get_valid_moves(), depth, lines=lines, store=store):
+        pass
+    return ai.next_move
+
+
+class PrincipalVariationTest(unittest.TestCase):
+    def test_transposition_hits_do_not_cut_the_line_short(self):
+        # Searched a second time, every node below the root finds an exact entry of its own depth
+        gs = GameState.from_fen(MIDDLEGAME_FEN)
+        for clear in (True, False):
+            search(gs, 4, clear=clear)
+            self.assertGreaterEqual(len(ai.principal_variation), 2)
+            self.assertEqual(ai.principal_variation[0], ai.next_move)
+
+
+    def test_every_multi_pv_line_is_a_variation(self):
+        gs = GameState.from_fen(MIDDLEGAME_FEN)
+        for clear in (True, False):
+            search(gs, 4, lines=3, clear=clear)
+            self.assertEqual(len(ai.principal_lines), 3)
+            self.assertEqual(len({line[0] for _, line in ai.principal_lines}), 3)
+            for _, line in ai.principal_lines:
+                self.assertGreater(len(line), 1)
+
+
+class PonderTest(unittest.TestCase):
+    def play_ai_move(self, gs):
+        """Searches and plays a move the way the game does; returns the search's best line"""
+        ai.transposition_table.clear()
+        task = ai.SearchTask(gs, math.inf, 4, use_book=False)
+        while not task.step(50):
+            pass
+        gs.make_move(task.best_move)
+        return task.lines[0][1]
+
+    def test_pondering_starts_after_an_ai_move(self):
+        gs = GameState.from_fen(MIDDLEGAME_FEN)
+        reply = ai.expected_reply(gs, self.play_ai_move(gs))
+        self.assertIn(reply, gs.get_valid_moves())
+        ponder = ai.SearchTask(gs, ponder_move=reply)
+        self.assertFalse(ponder.done)
+        gs.make_move(reply)
+        self.assertEqual(ponder.key, gs.zobrist_key)
+
+    def test_a_line_without_a_reply_falls_back_on_the_table(self):
+        gs = GameState.from_fen(MIDDLEGAME_FEN)
+        line = self.play_ai_move(gs)
+        self.assertIn(ai.expected_reply(gs, line[:1]), gs.get_valid_moves())
+
+
+class MateScoreTest(unittest.TestCase):
+    def test_mate_distance_comes_from_the_score(self):
+        gs = GameState.from_fen(MATE_IN_TWO_FEN)
+        for clear in (True, False):  # The second search answers from table entries stored plies deeper
+            move = search(gs, 5, clear=clear)
+            self.assertEqual(Move.from_code(move).get_chess_notation(), 'a1a6')
+            self.assertEqual(uci.score_text(ai.principal_lines[0][0]), 'mate 2')
+        gs.make_move(move)
+        for clear in (True, False):
+            search(gs, 5, clear=clear)
+            self.assertEqual(uci.score_text(ai.principal_lines[0][0]), 'mate -1')
+
+
+class RootStoreTest(unittest.TestCase):
+    def test_search_of_some_root_moves_stores_no_root_entry(self):
+        gs = GameState.from_fen(MIDDLEGAME_FEN)
+        moves = [move for move in gs.get_valid_moves() if Move.from_code(move).piece_moved[1] == 'P']
+        search(gs, 3, store=False, valid_moves=moves)
+        self.assertIsNone(ai.transposition_table.probe(gs.zobrist_key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,319 @@
+"""
+Texel tuning of the evaluation: fits the piece values, piece-square tables and pawn structure
+terms to the results of the games a set of positions came from, and writes them to weights.json,
+which engine.py and ai.py load at import in place of their hand-set values. Needs NumPy and
+runs offline under plain CPython:
+
+    python tune.py positions.txt                              # Tune every term, write weights.json
+    python tune.py positions.txt --epochs 30 --batch-size 65536 --learning-rate 0.5
+    python tune.py positions.txt --output /tmp/weights.json --processes 8
+    python tune.py positions.txt --check 2000                 # Only compare the fitted model with score_board
+
+Each line of the positions file is a FEN (the first four fields are enough) followed by the
+result of its game from White's side: 1-0, 0-1 or 1/2-1/2, bare, in brackets ([1.0], [0.5],
+[0.0]) or as an EPD c9 operation. Quiet positions (no capture or check pending) work best.
+
+For a given game phase the evaluation is linear in its weights, so every position is turned
+once into a sparse row of White-minus-Black term counts (through the engine's own tables and
+ai.count_pawn_terms) plus its phase. A static score is then a dot product, and the squared
+error between the result and sigmoid(K * score / 400) is minimized by mini-batch gradient
+descent with Adam steps, each batch a handful of vectorized NumPy operations. K is fitted
+first against the current weights so the tuning only moves the weights.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import ai
+import engine
+from engine import PIECE_TYPES, TOTAL_PHASE, GameState, squares_of
+
+
+RESULTS = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5, '1.0': 1.0, '0.5': 0.5, '0.0': 0.0}
+CHUNK_LINES = 20000  # Positions per task handed to a worker
+
+# Term indices: a value per piece type, a table entry per piece type and square (as White sees it),
+# then the pawn structure terms. Every term has a middlegame and an endgame weight.
+TABLE_START = len(PIECE_TYPES)
+DOUBLED = TABLE_START + 64 * len(PIECE_TYPES)
+ISOLATED = DOUBLED + 1
+PASSED = ISOLATED + 1  # Eight terms, by rank from the owner's side
+BLOCKED = PASSED + 8
+TERM_COUNT = BLOCKED + 1
+PIECE_INDEX = {piece_type: index for index, piece_type in enumerate(PIECE_TYPES)}
+
+
+def parse_position(line):
+    """(FEN, result from White's side) for one line, or None for a blank or comment line"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    fields = line.split()
+    result = RESULTS.get(fields[-1].strip('[]";'))
+    if len(fields) < 5 or result is None:
+        raise ValueError(f"Expected a FEN and a game result: {line!r}")
+    return ' '.join(fields[:4]) + ' 0 1', result
+
+
+def current_weights():
+    """(terms, 2) array of the (middlegame, endgame) weights the engine is using now"""
+    weights = np.zeros((TERM_COUNT, 2))
+    for phase, (values, tables) in enumerate(((engine.MIDDLEGAME_VALUES, engine.MIDDLEGAME_TABLES),
+                                              (engine.ENDGAME_VALUES, engine.ENDGAME_TABLES))):
+        for piece_type, index in PIECE_INDEX.items():
+            weights[index, phase] = values[piece_type]
+            start = TABLE_START + 64 * index
+            weights[start:start + 64, phase] = tables[piece_type]
+        weights[DOUBLED, phase] = ai.DOUBLED_PAWN[phase]
+        weights[ISOLATED, phase] = ai.ISOLATED_PAWN[phase]
+        weights[PASSED:PASSED + 8, phase] = [bonus[phase] for bonus in ai.PASSED_PAWN]
+        weights[BLOCKED, phase] = ai.BLOCKED_PASSED_PAWN[phase]
+    return weights
+
+
+def features(gs):
+    """({term: White minus Black count}, phase) of the terms score_board adds up for gs"""
+    counts = {}
+    for piece, bitboard in gs.bitboards.items():
+        sign = 1 if piece[0] == 'w' else -1
+        index = PIECE_INDEX[piece[1]]
+        table = TABLE_START + 64 * index
+        for square in squares_of(bitboard):
+            counts[index] = counts.get(index, 0) + sign
+            term = table + (square if sign > 0 else square ^ 56)
+            counts[term] = counts.get(term, 0) + sign
+    doubled, isolated, passed_ranks, white_passed, black_passed = ai.count_pawn_terms(gs.bitboards['wP'],
+                                                                                      gs.bitboards['bP'])
+    blocked = ((white_passed >> 8) & gs.occupancy['b']).bit_count() - ((black_passed << 8) & gs.occupancy['w']).bit_count()
+    for term, count in [(DOUBLED, doubled), (ISOLATED, isolated), (BLOCKED, blocked)] + \
+                       [(PASSED + rank, count) for rank, count in enumerate(passed_ranks)]:
+        if count:
+            counts[term] = count
+    return {term: count for term, count in counts.items() if count}, min(gs.phase, TOTAL_PHASE)
+
+
+def extract(lines):
+    """
+    Worker entry point: lines of the positions file -> (row lengths, terms, counts, phases,
+    results, lines skipped) as NumPy arrays, the rows laid end to end
+    """
+    lengths, terms, counts, phases, results = [], [], [], [], []
+    skipped = 0
+    for line in lines:
+        try:
+            parsed = parse_position(line)
+            if parsed is None:
+                continue
+            row, phase = features(GameState.from_fen(parsed[0]))
+        except (ValueError, KeyError, IndexError):
+            skipped += 1
+            continue
+        lengths.append(len(row))
+        terms.extend(row)
+        counts.extend(row.values())
+        phases.append(phase)
+        results.append(parsed[1])
+    return (np.array(lengths, np.int32), np.array(terms, np.int16), np.array(counts, np.int8),
+            np.array(phases, np.float32) / TOTAL_PHASE, np.array(results, np.float32), skipped)
+
+
+def chunks(path):
+    """The lines of the positions file in CHUNK_LINES pieces, one worker task each"""
+    with open(path) as positions_file:
+        chunk = []
+        for line in positions_file:
+            chunk.append(line)
+            if len(chunk) == CHUNK_LINES:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class Dataset:
+    """
+    Every position as a row of a sparse matrix in CSR layout (row offsets, term per entry,
+    count per entry), with its phase as a fraction of TOTAL_PHASE and its result. Rows are
+    shuffled once after loading, so consecutive positions of one game land in different batches.
+    """
+
+    def __init__(self, parts, seed=0):
+        lengths, terms, counts, phases, results, skipped = zip(*parts)
+        lengths = np.concatenate(lengths)
+        offsets = np.zeros(len(lengths) + 1, np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        order = np.random.default_rng(seed).permutation(len(lengths))
+        self.lengths = lengths[order]
+        self.offsets = np.zeros(len(lengths) + 1, np.int64)
+        np.cumsum(self.lengths, out=self.offsets[1:])
+        entries = np.repeat(offsets[:-1][order] - self.offsets[:-1], self.lengths) + np.arange(self.offsets[-1])
+        self.terms = np.concatenate(terms)[entries]
+        self.counts = np.concatenate(counts)[entries]
+        self.phases = np.concatenate(phases)[order]
+        self.results = np.concatenate(results)[order]
+        self.skipped = sum(skipped)
+
+    def __len__(self):
+        return len(self.results)
+
+    def batches(self, batch_size):
+        """(phases, results, row within the batch of each entry, terms, counts) per batch"""
+        for start in range(0, len(self), batch_size):
+            end = min(start + batch_size, len(self))
+            first, last = self.offsets[start], self.offsets[end]
+            rows = np.repeat(np.arange(end - start), self.lengths[start:end])
+            yield (self.phases[start:end], self.results[start:end], rows, self.terms[first:last],
+                   self.counts[first:last].astype(np.float32))
+
+
+def batch_scores(weights, batch):
+    """Static scores of a batch from White's side, as score_board gives them but without rounding"""
+    phases, _, rows, terms, counts = batch
+    # A row can be empty: in a symmetrical position every White count cancels a Black one
+    middlegame = np.bincount(rows, counts * weights[terms, 0], len(phases))
+    endgame = np.bincount(rows, counts * weights[terms, 1], len(phases))
+    return middlegame * phases + endgame * (1 - phases)
+
+
+def win_probability(scores, k):
+    return 1 / (1 + np.power(10, -k * scores / 400))
+
+
+def mean_error(dataset, weights, k, batch_size):
+    total = 0.0
+    for batch in dataset.batches(batch_size):
+        total += float(np.sum((batch[1] - win_probability(batch_scores(weights, batch), k)) ** 2))
+    return total / len(dataset)
+
+
+def fit_k(dataset, weights, batch_size):
+    """The sigmoid scaling that best maps the current scores to results, by golden-section search"""
+    scores = np.concatenate([batch_scores(weights, batch) for batch in dataset.batches(batch_size)])
+
+    def error(k):
+        return float(np.mean((dataset.results - win_probability(scores, k)) ** 2))
+
+    low, high = 0.05, 4.0
+    ratio = (math.sqrt(5) - 1) / 2
+    for _ in range(60):
+        left, right = high - ratio * (high - low), low + ratio * (high - low)
+        if error(left) < error(right):
+            high = right
+        else:
+            low = left
+    return (low + high) / 2
+
+
+def gradient(weights, batch, k):
+    """Gradient of the batch's mean squared error with respect to every (middlegame, endgame) weight"""
+    phases, results, rows, terms, counts = batch
+    probabilities = win_probability(batch_scores(weights, batch), k)
+    # d error / d score for each row, then spread over its entries by phase
+    slopes = (-2 / len(results)) * (results - probabilities) * probabilities * (1 - probabilities) * (k * math.log(10) / 400)
+    middlegame = (slopes * phases)[rows] * counts
+    endgame = (slopes * (1 - phases))[rows] * counts
+    return np.stack((np.bincount(terms, middlegame, TERM_COUNT), np.bincount(terms, endgame, TERM_COUNT)), axis=1)
+
+
+def tune(dataset, weights, k, epochs, batch_size, learning_rate, report=print):
+    """Adam over shuffled mini-batches; returns the fitted weights"""
+    weights = weights.copy()
+    first_moment = np.zeros_like(weights)
+    second_moment = np.zeros_like(weights)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    step = 0
+    for epoch in range(1, epochs + 1):
+        start = time.perf_counter()
+        for batch in dataset.batches(batch_size):
+            step += 1
+            grad = gradient(weights, batch, k)
+            first_moment = beta1 * first_moment + (1 - beta1) * grad
+            second_moment = beta2 * second_moment + (1 - beta2) * grad * grad
+            corrected = first_moment / (1 - beta1 ** step)
+            weights -= learning_rate * corrected / (np.sqrt(second_moment / (1 - beta2 ** step)) + epsilon)
+        report(f"epoch {epoch:3}: error {mean_error(dataset, weights, k, batch_size):.6f} "
+               f"({time.perf_counter() - start:.1f}s)")
+    return weights
+
+
+def weights_file_contents(weights):
+    """weights.json text for fitted weights, rounded to whole centipawns: one entry per line"""
+    rounded = np.rint(weights).astype(int)
+    contents = {}
+    for phase, name in enumerate(('middlegame', 'endgame')):
+        contents[f'{name}_values'] = {piece_type: int(rounded[index, phase]) for piece_type, index in PIECE_INDEX.items()}
+        contents[f'{name}_tables'] = {piece_type: rounded[TABLE_START + 64 * index:TABLE_START + 64 * (index + 1),
+                                                          phase].tolist()
+                                      for piece_type, index in PIECE_INDEX.items()}
+    contents['doubled_pawn'] = rounded[DOUBLED].tolist()
+    contents['isolated_pawn'] = rounded[ISOLATED].tolist()
+    contents['passed_pawn'] = rounded[PASSED:PASSED + 8].tolist()
+    contents['blocked_passed_pawn'] = rounded[BLOCKED].tolist()
+    return '{\n' + ',\n'.join(f'  {json.dumps(key)}: {json.dumps(value)}' for key, value in contents.items()) + '\n}\n'
+
+
+def check(path, count):
+    """Compares the feature model's score with ai.score_board on the first count positions"""
+    weights = current_weights()
+    worst = 0.0
+    checked = 0
+    with open(path) as positions_file:
+        for line in positions_file:
+            parsed = parse_position(line)
+            if parsed is None:
+                continue
+            gs = GameState.from_fen(parsed[0])
+            row, phase = features(gs)
+            middlegame = sum(weights[term, 0] * value for term, value in row.items())
+            endgame = sum(weights[term, 1] * value for term, value in row.items())
+            model = (middlegame * phase + endgame * (TOTAL_PHASE - phase)) / TOTAL_PHASE
+            worst = max(worst, abs(model - ai.score_board(gs)))
+            checked += 1
+            if checked == count:
+                break
+    print(f"Largest difference between the model and score_board over {checked} positions: {worst:.2f} centipawns "
+          f"(under 1 is rounding)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the chess evaluation weights on game results")
+    parser.add_argument('positions', help="File of FENs, each followed by its game result")
+    parser.add_argument('--output', default=engine.WEIGHTS_PATH, help="Weights file to write (default: weights.json)")
+    parser.add_argument('--epochs', type=int, default=20, help="Passes over every position")
+    parser.add_argument('--batch-size', type=int, default=16384, help="Positions per gradient step")
+    parser.add_argument('--learning-rate', type=float, default=1.0, help="Adam step size in centipawns")
+    parser.add_argument('--k', type=float, help="Sigmoid scaling to use instead of fitting it")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="Worker processes for feature extraction")
+    parser.add_argument('--check', type=int, metavar='COUNT',
+                        help="Only compare the model with score_board on the first COUNT positions")
+    args = parser.parse_args()
+
+    if args.check:
+        check(args.positions, args.check)
+        return
+    start = time.perf_counter()
+    with Pool(args.processes) as pool:
+        dataset = Dataset(pool.imap(extract, chunks(args.positions)))
+    print(f"{len(dataset)} positions ({dataset.skipped} lines skipped) read in {time.perf_counter() - start:.1f}s")
+
+    weights = current_weights()
+    k = args.k or fit_k(dataset, weights, args.batch_size)
+    print(f"K {k:.4f}, error with the current weights {mean_error(dataset, weights, k, args.batch_size):.6f}")
+    weights = tune(dataset, weights, k, args.epochs, args.batch_size, args.learning_rate)
+
+    with open(args.output, 'w') as weights_file:
+        weights_file.write(weights_file_contents(weights))
+    rounded = np.rint(weights).astype(int)
+    print(f"Wrote {args.output} after {time.perf_counter() - start:.1f}s. Piece values (middlegame/endgame): "
+          + ', '.join(f"{piece_type} {rounded[index, 0]}/{rounded[index, 1]}"
+                      for piece_type, index in PIECE_INDEX.items() if piece_type != 'K'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+UCI (Universal Chess Interface) front-end for the AI, so it can play other engines in a GUI or a
+tournament manager and be timed by scripts, all offline under plain CPython:
+
+    python uci.py                                            # Speaks UCI on stdin/stdout
+    cutechess-cli -engine cmd="python uci.py" -engine cmd=stockfish -each tc=40/60 -games 20
+    printf 'position startpos moves e2e4\\ngo depth 5\\n' | python uci.py   # Fixed-depth timing run
+
+Supported: uci, isready, setoption (Hash, OwnBook, MultiPV), ucinewgame, position (startpos or fen, then
+moves), go (depth, movetime, nodes, wtime/btime/winc/binc/movestogo, infinite), stop and quit.
+The search runs on its own thread so stop is read while it thinks; each completed iteration
+sends an info line. The engine only ever promotes to a queen, so an underpromotion in a
+position command is refused.
+"""
+
+import math
+import sys
+import threading
+
+import ai
+from engine import PIECE_MASK, PROMOTION_SHIFT, GameState, Move
+
+
+ENGINE_NAME = 'Retro Arcade Chess'
+DEFAULT_MOVES_TO_GO = 30  # Moves the remaining clock time is shared between when the GUI does not say
+MOVE_OVERHEAD_MS = 50  # Kept back from every clock budget for the GUI and process latency
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+def uci_notation(move):
+    """Long algebraic notation of a packed move, as UCI writes it: e2e4, e7e8q, e1g1 for castling"""
+    notation = Move.from_code(move).get_chess_notation()
+    return notation + 'q' if move >> PROMOTION_SHIFT & PIECE_MASK else notation
+
+
+def score_text(score):
+    """UCI score of a root score from the side to move: mates in moves, anything else in centipawns"""
+    moves = ai.mate_distance(score)
+    return f"mate {moves}" if moves is not None else f"cp {score}"
+
+
+def clock_budget_ms(time_left_ms, increment_ms, moves_to_go):
+    """Thinking time for one move out of the remaining clock time"""
+    budget = time_left_ms / (moves_to_go or DEFAULT_MOVES_TO_GO) + increment_ms * 3 / 4
+    return max(1, min(budget, time_left_ms / 2) - MOVE_OVERHEAD_MS)
+
+
+class UciSession:
+    """State of one UCI conversation: the position, the options and the search in progress"""
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.gs = GameState()
+        self.use_book = True
+        self.multi_pv = 1
+        self.search_thread = None
+        self.time_manager = None
+        self.infinite = False
+        self.stop_event = threading.Event()
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def handle(self, line):
+        """Acts on one command line; returns False once the GUI has sent quit"""
+        words = line.split()
+        if not words:
+            return True
+        command, arguments = words[0], words[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author Retro Arcade")
+            self.send(f"option name Hash type spin default {ai.TT_SIZE_KB // 1024} min 1 max 1024")
+            self.send("option name OwnBook type check default true")
+            self.send("option name MultiPV type spin default 1 min 1 max 16")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(arguments)
+        elif command == 'ucinewgame':
+            self.stop()
+            ai.transposition_table.clear()
+            ai.pawn_table.clear()
+        elif command == 'position':
+            self.stop()
+            self.set_position(arguments)
+        elif command == 'go':
+            self.stop()
+            self.go(arguments)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, arguments):
+        text = ' '.join(arguments)
+        name, _, value = text.partition(' value ')
+        name = name.removeprefix('name ').strip().lower()
+        if name == 'hash':
+            ai.transposition_table = ai.TranspositionTable(max(1, int(value)) * 1024)
+        elif name == 'ownbook':
+            self.use_book = value.strip().lower() == 'true'
+        elif name == 'multipv':
+            self.multi_pv = max(1, int(value))
+        else:
+            self.send(f"info string unknown option {name}")
+
+    def set_position(self, arguments):
+        """position startpos|fen <FEN> [moves <move> ...]"""
+        if 'moves' in arguments:
+            split = arguments.index('moves')
+            setup, moves = arguments[:split], arguments[split + 1:]
+        else:
+            setup, moves = arguments, []
+        try:
+            self.gs = GameState.from_fen(' '.join(setup[1:]) if setup[:1] == ['fen'] else START_FEN)
+        except ValueError as error:
+            self.send(f"info string {error}")
+            return
+        for notation in moves:
+            legal = {uci_notation(move): move for move in self.gs.get_valid_moves()}
+            move = legal.get(notation.lower())
+            if move is None:
+                self.send(f"info string illegal or unsupported move {notation}")
+                return
+            self.gs.make_move(move)
+
+    def go(self, arguments):
+        """Starts a search on its own thread with the limits given"""
+        limits = {}
+        for name, value in zip(arguments, arguments[1:] + ['']):
+            if name in ('depth', 'movetime', 'nodes', 'wtime', 'btime', 'winc', 'binc', 'movestogo'):
+                limits[name] = int(value)
+        self.infinite = 'infinite' in arguments or not limits  # A bare go searches until stop, too
+        if 'movetime' in limits:
+            budget_ms = limits['movetime']
+        elif ('wtime' if self.gs.white_to_move else 'btime') in limits:
+            side = 'w' if self.gs.white_to_move else 'b'
+            budget_ms = clock_budget_ms(limits[side + 'time'], limits.get(side + 'inc', 0), limits.get('movestogo'))
+        else:
+            budget_ms = math.inf  # depth, nodes, infinite or no limit at all: searched until stopped
+        self.stop_event.clear()
+        self.time_manager = ai.TimeManager(budget_ms, limits.get('nodes', math.inf))
+        self.search_thread = threading.Thread(
+            target=self.search, args=(self.gs, limits.get('depth', ai.MAX_DEPTH), self.time_manager, self.infinite),
+            daemon=True)
+        self.search_thread.start()
+
+    def search(self, gs, max_depth, time_manager, infinite):
+        """Search thread: sends info lines per iteration (one per line under MultiPV), then bestmove"""
+        lines = self.multi_pv
+
+        def on_iteration(depth, move, score, elapsed_ms):
+            nodes = time_manager.nodes
+            for number, (line_score, pv) in enumerate(ai.principal_lines, 1):
+                self.send(f"info depth {depth}{f' multipv {number}' if lines > 1 else ''} "
+                          f"score {score_text(line_score)} nodes {nodes} "
+                          f"nps {int(nodes * 1000 / max(elapsed_ms, 1))} time {int(elapsed_ms)} "
+                          f"pv {' '.join(uci_notation(pv_move) for pv_move in pv)}")
+
+        valid_moves = gs.get_valid_moves()
+        move = ai.prepared_move(gs, self.use_book) if valid_moves and lines == 1 else None
+        if move is None and valid_moves:
+            ai.time_manager = time_manager
+            for _ in ai.search_best_move(gs, valid_moves, max_depth, on_iteration, lines):
+                pass
+            move = ai.next_move if ai.next_move is not None else valid_moves[0]
+        if infinite:
+            self.stop_event.wait()  # UCI holds bestmove back until stop, even once the search is over
+        self.send(f"bestmove {uci_notation(move) if move is not None else '0000'}")
+
+    def stop(self):
+        """Ends the search in progress, if any, and waits for its bestmove"""
+        if self.search_thread is None:
+            return
+        self.time_manager.stopped = True
+        self.stop_event.set()
+        self.search_thread.join()
+        self.search_thread = None
+
+    def finish(self):
+        """At the end of input: lets a limited search run to its limit, but stops an infinite one"""
+        if self.search_thread is not None and not self.infinite:
+            self.search_thread.join()
+        self.stop()
+
+
+def main():
+    session = UciSession()
+    for line in sys.stdin:
+        if not session.handle(line):
+            return
+    session.finish()
+
+
+if __name__ == '__main__':
+    main()